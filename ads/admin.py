@@ -1,6 +1,29 @@
 from django.contrib import admin
 
-from ads.models import Ad, Review
+from ads.models import Ad, Review, SlowQuery
+from ads.slow_queries import plan_node_types
 
 admin.site.register(Ad)
 admin.site.register(Review)
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'duration_ms', 'view', 'plan_nodes', 'short_sql')
+    list_filter = ('view',)
+    search_fields = ('sql', 'view')
+    readonly_fields = ('created_at', 'duration_ms', 'view', 'sql', 'params', 'stack', 'plan')
+
+    @admin.display(description='узлы плана')
+    def plan_nodes(self, obj):
+        return ', '.join(sorted(set(plan_node_types(obj.plan))))
+
+    @admin.display(description='запрос')
+    def short_sql(self, obj):
+        return obj.sql[:150]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
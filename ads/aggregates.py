@@ -0,0 +1,65 @@
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Greatest, Now
+
+from ads.cache import ads_list_cache
+from ads.models import Ad, Review
+
+
+def review_added(review):
+    """Увеличивает счетчик отзывов объявления и сдвигает дату последнего отзыва одним UPDATE"""
+    Ad.objects.filter(pk=review.ad_id).update(
+        review_count=F('review_count') + 1,
+        last_review_at=Greatest(F('last_review_at'), Value(review.created_at)),
+        updated_at=Now(),
+    )
+    transaction.on_commit(ads_list_cache.bump)
+
+
+def review_removed(review):
+    """Уменьшает счетчик отзывов объявления и пересчитывает дату последнего отзыва по индексу (ad, -created_at)"""
+    latest = Review.objects.filter(ad=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    Ad.objects.filter(pk=review.ad_id).update(
+        review_count=Greatest(F('review_count') - 1, Value(0)),
+        last_review_at=Subquery(latest),
+        updated_at=Now(),
+    )
+    transaction.on_commit(ads_list_cache.bump)
+
+
+def update_review_aggregates(condition, params):
+    """Исправляет review_count и last_review_at у объявлений ad, подходящих под условие condition.
+
+    Обновляются только разошедшиеся строки, возвращается их количество.
+    """
+    ad_table = Ad._meta.db_table
+    review_table = Review._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            UPDATE {ad_table} AS ad
+            SET review_count = actual.review_count, last_review_at = actual.last_review_at, updated_at = NOW()
+            FROM (
+                SELECT ad.id, COUNT(review.id) AS review_count, MAX(review.created_at) AS last_review_at
+                FROM {ad_table} AS ad
+                LEFT JOIN {review_table} AS review ON review.ad_id = ad.id
+                WHERE {condition}
+                GROUP BY ad.id
+            ) AS actual
+            WHERE ad.id = actual.id
+              AND (ad.review_count, ad.last_review_at) IS DISTINCT FROM (actual.review_count, actual.last_review_at)
+            ''',
+            params,
+        )
+        return cursor.rowcount
+
+
+def recompute_review_aggregates(start_id, end_id):
+    """Исправляет агрегаты отзывов у объявлений с id в полуинтервале (start_id, end_id]"""
+    return update_review_aggregates('ad.id > %s AND ad.id <= %s', (start_id, end_id))
+
+
+def recompute_ads_review_aggregates(ad_ids):
+    """Исправляет агрегаты отзывов у перечисленных объявлений"""
+    return update_review_aggregates('ad.id = ANY(%s)', (list(ad_ids),))
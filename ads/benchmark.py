@@ -0,0 +1,303 @@
+import json
+import math
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+from django.contrib.auth.models import Group
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ads.cache import ads_list_cache
+from ads.models import Ad, Review
+from users.models import User
+from users.permissions import ADMIN_GROUP
+from users.serializers import UserTokenObtainPairSerializer
+
+BENCHMARK_EMAIL_DOMAIN = 'benchmark.example'
+BENCHMARK_PASSWORD = 'benchmark-password'
+EXPORT_TAIL = 1000
+
+HOT_SCENARIOS = ('ads_feed:anonymous', 'ads_feed:user', 'login:anonymous')
+
+
+class Scenario:
+    """Один замеряемый запрос: маршрут, роль клиента и подготовка данных для каждой итерации"""
+
+    def __init__(self, url_name, method='get', role='anonymous', status=200, prepare=None, variant=None):
+        self.url_name = url_name
+        self.method = method
+        self.role = role
+        self.status = status
+        self.prepare = prepare or (lambda fixture: {})
+        self.variant = variant
+
+    @property
+    def name(self):
+        name = f'{self.url_name.split(":")[-1]}:{self.role}'
+        return f'{name}:{self.variant}' if self.variant else name
+
+
+class Fixture:
+    """Пользователи и объекты, на которых выполняются сценарии; создаются внутри откатываемой транзакции"""
+
+    def __init__(self):
+        self.sequence = count()
+        self.group, _ = Group.objects.get_or_create(name=ADMIN_GROUP)
+        self.user = self.create_user('user')
+        self.admin = self.create_user('admin')
+        self.admin.groups.add(self.group)
+        self.ad = Ad.objects.create(title='Телефон', price=10000, description='Почти новый', author=self.user)
+        self.review = Review.objects.create(text='Хороший телефон', ad=self.ad, author=self.user)
+        self.refresh_token = str(UserTokenObtainPairSerializer.get_token(self.user))
+        self.export_after_id = {
+            'ads': max((Ad.objects.aggregate(last_id=Max('pk'))['last_id'] or 0) - EXPORT_TAIL, 0),
+            'reviews': max((Review.objects.aggregate(last_id=Max('pk'))['last_id'] or 0) - EXPORT_TAIL, 0),
+        }
+        self.headers = {
+            'anonymous': {},
+            'user': self.auth_headers(self.user),
+            'admin': self.auth_headers(self.admin),
+        }
+
+    def unique_email(self, name):
+        return f'{name}{next(self.sequence)}@{BENCHMARK_EMAIL_DOMAIN}'
+
+    def create_user(self, name):
+        user = User(email=self.unique_email(name), first_name=name, is_active=True)
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save()
+        return user
+
+    @staticmethod
+    def auth_headers(user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {UserTokenObtainPairSerializer.get_token(user).access_token}'}
+
+    def new_ad(self):
+        return Ad.objects.create(title='Велосипед', price=5000, author=self.user)
+
+    def new_review(self):
+        return Review.objects.create(text='Отличный велосипед', ad=self.ad, author=self.user)
+
+
+def user_to_delete(fixture):
+    user = User.objects.create(email=fixture.unique_email('deleted'), is_active=True)
+    return {'kwargs': {'pk': user.pk}, 'headers': fixture.auth_headers(user)}
+
+
+def reset_password_confirm(fixture):
+    fixture.user.token = 'benchmark'
+    fixture.user.save(update_fields=['token'])
+    return {'data': {'uid': fixture.user.pk, 'token': 'benchmark', 'new_password': BENCHMARK_PASSWORD}}
+
+
+SCENARIOS = (
+    Scenario('ads:ads_list'),
+    Scenario('ads:ads_list', role='user'),
+    Scenario('ads:ads_list', role='user', prepare=lambda fixture: {'query': {'ordering': 'price'}}, variant='price'),
+    Scenario('ads:ads_feed'),
+    Scenario('ads:ads_feed', role='user'),
+    Scenario('ads:ads_search', prepare=lambda fixture: {'query': {'q': 'телефон'}}),
+    Scenario('ads:ads_autocomplete', prepare=lambda fixture: {'query': {'q': 'тел'}}),
+    Scenario('ads:ads_create', 'post', 'user', 201,
+             lambda fixture: {'data': {'title': 'Ноутбук', 'price': 30000, 'description': 'Как новый'}}),
+    Scenario('ads:ads_bulk_create', 'post', 'user', 201,
+             lambda fixture: {'data': [{'title': f'Книга {number}', 'price': 100} for number in range(100)]}),
+    Scenario('ads:ads_retrieve', role='user', prepare=lambda fixture: {'kwargs': {'pk': fixture.ad.pk}}),
+    Scenario('ads:ads_update', 'patch', 'user',
+             prepare=lambda fixture: {'kwargs': {'pk': fixture.ad.pk}, 'data': {'price': 9000}}),
+    Scenario('ads:ads_delete', 'delete', 'user', 204, lambda fixture: {'kwargs': {'pk': fixture.new_ad().pk}}),
+    Scenario('ads:reviews_list', role='user'),
+    Scenario('ads:reviews_create', 'post', 'user', 201,
+             lambda fixture: {'data': {'text': 'Спасибо', 'ad': fixture.ad.pk}}),
+    Scenario('ads:reviews_retrieve', role='user', prepare=lambda fixture: {'kwargs': {'pk': fixture.review.pk}}),
+    Scenario('ads:reviews_update', 'patch', 'user',
+             prepare=lambda fixture: {'kwargs': {'pk': fixture.review.pk}, 'data': {'text': 'Очень хороший'}}),
+    Scenario('ads:reviews_delete', 'delete', 'user', 204,
+             lambda fixture: {'kwargs': {'pk': fixture.new_review().pk}}),
+    Scenario('ads:ads_export', role='admin',
+             prepare=lambda fixture: {'query': {'after_id': fixture.export_after_id['ads']}}),
+    Scenario('ads:reviews_export', role='admin',
+             prepare=lambda fixture: {'query': {'after_id': fixture.export_after_id['reviews']}}),
+    Scenario('users:users_register', 'post', status=201,
+             prepare=lambda fixture: {'data': {'email': fixture.unique_email('register'),
+                                               'password': BENCHMARK_PASSWORD}}),
+    Scenario('users:users_list', role='user'),
+    Scenario('users:users_retrieve', role='user', prepare=lambda fixture: {'kwargs': {'pk': fixture.user.pk}}),
+    Scenario('users:users_update', 'patch', 'user',
+             prepare=lambda fixture: {'kwargs': {'pk': fixture.user.pk}, 'data': {'first_name': 'Иван'}}),
+    Scenario('users:users_delete', 'delete', 'user', 204, user_to_delete),
+    Scenario('users:login', 'post',
+             prepare=lambda fixture: {'data': {'email': fixture.user.email, 'password': BENCHMARK_PASSWORD}}),
+    Scenario('users:token_refresh', 'post', prepare=lambda fixture: {'data': {'refresh': fixture.refresh_token}}),
+    Scenario('users:reset_password', 'post', 'user',
+             prepare=lambda fixture: {'data': {'email': fixture.user.email}}),
+    Scenario('users:reset_password_confirm', 'post', 'user', prepare=reset_password_confirm),
+)
+
+
+def percentile(sorted_values, percent):
+    """Процентиль методом ближайшего ранга"""
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def send(client, scenario, fixture):
+    """Выполняет один запрос сценария и возвращает (ответ, секунды, число SQL-запросов)"""
+    options = scenario.prepare(fixture)
+    path = reverse(scenario.url_name, kwargs=options.get('kwargs'))
+    headers = options.get('headers', fixture.headers[scenario.role])
+
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        if scenario.method == 'get':
+            response = client.get(path, options.get('query'), **headers)
+        else:
+            response = getattr(client, scenario.method)(path, json.dumps(options.get('data')),
+                                                        content_type='application/json', **headers)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - started
+    return response, elapsed, counter.count
+
+
+def run_scenario(client, scenario, fixture, requests, warmup, max_seconds=None):
+    """Замеряет сценарий; прогрев и замер останавливаются раньше, если каждый занял больше max_seconds"""
+    started = time.perf_counter()
+    for _ in range(warmup):
+        send(client, scenario, fixture)
+        if max_seconds and time.perf_counter() - started > max_seconds:
+            break
+
+    timings = []
+    queries = 0
+    statuses = Counter()
+    for _ in range(requests):
+        response, elapsed, query_count = send(client, scenario, fixture)
+        timings.append(elapsed)
+        queries += query_count
+        statuses[response.status_code] += 1
+        if max_seconds and sum(timings) > max_seconds:
+            break
+
+    measured = len(timings)
+    timings.sort()
+    return {
+        'requests': measured,
+        'errors': measured - statuses[scenario.status],
+        'statuses': {str(code): number for code, number in sorted(statuses.items())},
+        'mean_ms': round(sum(timings) / measured * 1000, 3),
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'throughput_rps': round(measured / sum(timings), 1),
+        'queries_per_request': round(queries / measured, 2),
+    }
+
+
+def run_benchmark(scenarios=SCENARIOS, requests=100, warmup=5, max_seconds=None, progress=None):
+    """Прогоняет сценарии через тестовый клиент Django и возвращает отчет.
+
+    Все изменения, сделанные сценариями, откатываются; письма не отправляются.
+    """
+    report = {
+        'created_at': timezone.now().isoformat(),
+        'dataset': {
+            'users': User.objects.count(),
+            'ads': Ad.objects.count(),
+            'reviews': Review.objects.count(),
+        },
+        'requests': requests,
+        'warmup': warmup,
+        'max_seconds': max_seconds,
+        'results': {},
+    }
+    client = Client(raise_request_exception=False)
+
+    with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'), transaction.atomic():
+        fixture = Fixture()
+        for scenario in scenarios:
+            result = run_scenario(client, scenario, fixture, requests, warmup, max_seconds)
+            report['results'][scenario.name] = result
+            if progress:
+                progress(scenario.name, result)
+        transaction.set_rollback(True)
+    # кэш не откатывается вместе с транзакцией: страницы, закэшированные по данным сценариев, становятся недоступны
+    ads_list_cache.bump()
+
+    return report
+
+
+def register_users(worker_id, requests):
+    """Регистрирует requests пользователей в отдельном потоке со своим соединением с базой и удаляет их"""
+    client = Client(raise_request_exception=False)
+    path = reverse('users:users_register')
+    prefix = f'register-{worker_id}-'
+    timings = []
+    errors = 0
+    try:
+        for number in range(requests):
+            data = {'email': f'{prefix}{number}@{BENCHMARK_EMAIL_DOMAIN}', 'password': BENCHMARK_PASSWORD}
+            started = time.perf_counter()
+            response = client.post(path, json.dumps(data), content_type='application/json')
+            timings.append(time.perf_counter() - started)
+            errors += response.status_code != 201
+        User.objects.filter(email__startswith=prefix, email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}').delete()
+    finally:
+        connection.close()
+    return timings, errors
+
+
+def run_registration_benchmark(workers=4, requests=10):
+    """Замеряет регистрацию из workers потоков одновременно, как при таком же числе потоков веб-сервера.
+
+    В отличие от run_benchmark пользователи создаются в отдельных транзакциях и удаляются после замера.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(register_users, [f'{run_id}-{worker}' for worker in range(workers)],
+                                [requests] * workers))
+    elapsed = time.perf_counter() - started
+
+    timings = sorted(timing for worker_timings, _ in results for timing in worker_timings)
+    throughput = len(timings) / elapsed
+    return {
+        'workers': workers,
+        'requests': len(timings),
+        'errors': sum(errors for _, errors in results),
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'throughput_rps': round(throughput, 1),
+        'throughput_per_worker_rps': round(throughput / workers, 2),
+    }
+
+
+def compare_reports(report, baseline, names=HOT_SCENARIOS, threshold=0.2, metric='p95_ms'):
+    """Возвращает список (сценарий, было, стало) для сценариев, ухудшившихся больше чем на threshold"""
+    regressions = []
+    for name in names:
+        current = report['results'].get(name)
+        previous = baseline['results'].get(name)
+        if current is None or previous is None:
+            continue
+        if current[metric] > previous[metric] * (1 + threshold):
+            regressions.append((name, previous[metric], current[metric]))
+    return regressions
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш в памяти процесса с ограничением по размеру и времени жизни записей"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VersionedResponseCache:
+    """Кэш данных ответов, сбрасываемый за O(1) сменой поколения.
+
+    Ключ страницы содержит текущее поколение, поэтому после bump() старые записи просто перестают
+    запрашиваться и вытесняются по таймауту без перебора ключей.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.version_key = f'{prefix}:version'
+        self.hits_key = f'{prefix}:hits'
+        self.misses_key = f'{prefix}:misses'
+
+    def get_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def bump(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, time.time_ns(), timeout=None)
+
+    def make_key(self, request):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+        return f'{self.prefix}:{self.get_version()}:{md5(url.encode(), usedforsecurity=False).hexdigest()}'
+
+    def get(self, key):
+        data = cache.get(key)
+        self._count(self.misses_key if data is None else self.hits_key)
+        return data
+
+    def set(self, key, data):
+        cache.set(key, data, timeout=settings.ADS_LIST_CACHE_TIMEOUT)
+
+    def get_stats(self):
+        counters = cache.get_many((self.hits_key, self.misses_key))
+        return {
+            'version': self.get_version(),
+            'hits': counters.get(self.hits_key, 0),
+            'misses': counters.get(self.misses_key, 0),
+        }
+
+    def reset_stats(self):
+        cache.delete_many((self.hits_key, self.misses_key))
+
+    @staticmethod
+    def _count(key):
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+
+ads_list_cache = VersionedResponseCache('ads:list')
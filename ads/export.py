@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ads.models import Ad, Review
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+EXPORT_FORMATS = (CSV, NDJSON)
+
+CONTENT_TYPES = {
+    CSV: 'text/csv; charset=utf-8',
+    NDJSON: 'application/x-ndjson; charset=utf-8',
+}
+
+EXPORT_MODELS = {
+    'ads': (Ad, ('id', 'title', 'price', 'description', 'created_at', 'updated_at', 'author_id', 'review_count',
+                 'last_review_at')),
+    'reviews': (Review, ('id', 'ad_id', 'author_id', 'text', 'created_at', 'updated_at')),
+}
+
+
+def iter_rows(name, after_id=0, chunk_size=2000):
+    """Читает строки по возрастанию id через серверный курсор, не держа всю таблицу в памяти"""
+    model, fields = EXPORT_MODELS[name]
+    return (
+        model.objects.filter(pk__gt=after_id)
+        .order_by('pk')
+        .values_list(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _chunked(lines, chunk_size):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _csv_lines(fields, rows, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def render(row):
+        writer.writerow(row)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    if header:
+        yield render(fields)
+    for row in rows:
+        yield render(value.isoformat() if hasattr(value, 'isoformat') else value for value in row)
+
+
+def _ndjson_lines(fields, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def iter_export(name, export_format, after_id=0, chunk_size=2000):
+    """Возвращает генератор текстовых блоков выгрузки таблицы name в формате CSV или NDJSON.
+
+    Заголовок CSV пишется только в начале выгрузки, при продолжении после after_id его нет.
+    """
+    fields = EXPORT_MODELS[name][1]
+    rows = iter_rows(name, after_id=after_id, chunk_size=chunk_size)
+
+    if export_format == CSV:
+        lines = _csv_lines(fields, rows, header=not after_id)
+    else:
+        lines = _ndjson_lines(fields, rows)
+    return _chunked(lines, chunk_size)
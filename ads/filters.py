@@ -0,0 +1,90 @@
+from django import forms
+from django.db.models import F
+from django_filters import rest_framework as filters
+
+from ads.models import Ad, Review
+
+NEWEST = '-created_at'
+PRICE_ASC = 'price'
+PRICE_DESC = '-price'
+REVIEW_ACTIVITY = '-last_review_at'
+
+ORDERING_CHOICES = (
+    (NEWEST, 'сначала новые'),
+    (PRICE_ASC, 'сначала дешевые'),
+    (PRICE_DESC, 'сначала дорогие'),
+    (REVIEW_ACTIVITY, 'сначала недавно обсуждаемые'),
+)
+
+ORDER_BY = {
+    NEWEST: ('-created_at', '-id'),
+    PRICE_ASC: ('price', 'id'),
+    PRICE_DESC: ('-price', '-id'),
+    REVIEW_ACTIVITY: (F('last_review_at').desc(nulls_last=True), '-id'),
+}
+
+# Для каждой сортировки - фильтры на равенство, которые могут стоять префиксом составного индекса,
+# и фильтры диапазона по колонке самой сортировки. Другие сочетания не покрываются индексами Ad.
+SUPPORTED_FILTERS = {
+    NEWEST: {'equality': ('author', 'title'), 'range': ('created_after', 'created_before')},
+    PRICE_ASC: {'equality': ('author',), 'range': ('price_min', 'price_max')},
+    PRICE_DESC: {'equality': ('author',), 'range': ('price_min', 'price_max')},
+    REVIEW_ACTIVITY: {'equality': (), 'range': ()},
+}
+
+
+class AdFilterForm(forms.Form):
+
+    def clean(self):
+        cleaned_data = super().clean()
+        ordering = cleaned_data.get('ordering') or NEWEST
+        supported = SUPPORTED_FILTERS[ordering]
+        used = [name for name, value in cleaned_data.items() if name != 'ordering' and value not in (None, '')]
+
+        equality = [name for name in used if name in supported['equality']]
+        unsupported = [name for name in used if name not in supported['equality'] + supported['range']]
+
+        if unsupported or len(equality) > 1:
+            raise forms.ValidationError(
+                f'Сочетание фильтров {", ".join(used)} с сортировкой {ordering} не поддерживается'
+            )
+        return cleaned_data
+
+
+class AdFilter(filters.FilterSet):
+    title = filters.CharFilter(field_name='title')
+    author = filters.NumberFilter(field_name='author_id')
+    price_min = filters.NumberFilter(field_name='price', lookup_expr='gte')
+    price_max = filters.NumberFilter(field_name='price', lookup_expr='lte')
+    created_after = filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lte')
+    ordering = filters.ChoiceFilter(choices=ORDERING_CHOICES, method='filter_ordering')
+
+    class Meta:
+        model = Ad
+        form = AdFilterForm
+        fields = ('title', 'author', 'price_min', 'price_max', 'created_after', 'created_before', 'ordering')
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ordering = self.form.cleaned_data.get('ordering') or NEWEST
+        return queryset.order_by(*ORDER_BY[ordering])
+
+
+class AdFeedFilter(AdFilter):
+    ordering = filters.ChoiceFilter(choices=ORDERING_CHOICES[:1], method='filter_ordering')
+
+
+class ReviewFilter(filters.FilterSet):
+    ad = filters.NumberFilter(field_name='ad_id', method='filter_ad')
+
+    class Meta:
+        model = Review
+        fields = ('ad',)
+
+    def filter_ad(self, queryset, name, value):
+        # отзывы одного объявления читаются по индексу (ad, -created_at) уже в нужном порядке
+        return queryset.filter(ad_id=value).order_by('-created_at')
@@ -0,0 +1,170 @@
+import csv
+import io
+import json
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ads.models import Ad, Review
+from users.models import User
+
+MAX_POSITIVE_INTEGER = 2147483647
+
+
+def copy_rows(model, columns, rows):
+    """Записывает строки (кортежи значений в порядке columns) одной командой COPY FROM STDIN"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(rows)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {model._meta.db_table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+
+
+class RowError(Exception):
+    pass
+
+
+def read_rows(file, file_format):
+    """Построчно читает словари из CSV с заголовком или из JSONL"""
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+    else:
+        for line in file:
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield RowError(f'некорректный JSON: {exc.msg}')
+                    continue
+                yield row if isinstance(row, dict) else RowError('ожидается JSON-объект')
+
+
+def clean_text(row, name, max_length=None, required=True):
+    value = row.get(name)
+    value = '' if value is None else str(value).strip()
+    if not value:
+        if required:
+            raise RowError(f'{name}: обязательное поле')
+        return None
+    if max_length and len(value) > max_length:
+        raise RowError(f'{name}: не больше {max_length} символов')
+    return value
+
+
+def clean_positive_int(row, name):
+    try:
+        value = int(row.get(name))
+    except (TypeError, ValueError):
+        raise RowError(f'{name}: требуется целое число')
+    if not 0 <= value <= MAX_POSITIVE_INTEGER:
+        raise RowError(f'{name}: допустимы значения от 0 до {MAX_POSITIVE_INTEGER}')
+    return value
+
+
+def clean_datetime(row, name, default):
+    value = row.get(name)
+    if not value:
+        return default
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise RowError(f'{name}: неверный формат даты и времени')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def clean_ad(row, now):
+    """Проверяет строку объявления по тем же правилам, что AdSerializer"""
+    return {
+        'title': clean_text(row, 'title', max_length=Ad._meta.get_field('title').max_length),
+        'price': clean_positive_int(row, 'price'),
+        'description': clean_text(row, 'description', required=False),
+        'created_at': clean_datetime(row, 'created_at', now),
+        'author_email': clean_text(row, 'author_email', required=False),
+        'review_count': 0,
+    }
+
+
+def clean_review(row, now):
+    """Проверяет строку отзыва по тем же правилам, что ReviewSerializer"""
+    return {
+        'text': clean_text(row, 'text'),
+        'ad_id': clean_positive_int(row, 'ad_id'),
+        'created_at': clean_datetime(row, 'created_at', now),
+        'author_email': clean_text(row, 'author_email', required=False),
+    }
+
+
+class Importer:
+    """Загружает строки пачками: проверка, пакетное сопоставление авторов и COPY FROM STDIN на пачку"""
+    models = {
+        'ads': (Ad, clean_ad, ('title', 'price', 'description', 'created_at', 'updated_at', 'author_id',
+                               'review_count')),
+        'reviews': (Review, clean_review, ('text', 'ad_id', 'created_at', 'updated_at', 'author_id')),
+    }
+
+    def __init__(self, name, max_errors=20):
+        self.model, self.clean, self.columns = self.models[name]
+        self.author_ids = {}
+        self.imported = 0
+        self.rejected = 0
+        # объявления, к которым загружены отзывы: только у них нужно пересчитать агрегаты
+        self.review_ad_ids = set()
+        self.max_errors = max_errors
+        self.errors = []
+
+    def reject(self, line_number, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line_number, message))
+
+    def resolve_authors(self, emails):
+        missing = {email for email in emails if email and email not in self.author_ids}
+        if missing:
+            self.author_ids.update(User.objects.filter(email__in=missing).values_list('email', 'id'))
+
+    def existing_ad_ids(self, rows):
+        return set(Ad.objects.filter(pk__in={row['ad_id'] for row in rows}).values_list('pk', flat=True))
+
+    def load_batch(self, batch):
+        """batch - список пар (номер строки, словарь или RowError); возвращает число загруженных строк"""
+        now = timezone.now()
+        rows = []
+        for line_number, raw in batch:
+            try:
+                if isinstance(raw, RowError):
+                    raise raw
+                row = self.clean(raw, now)
+                row['line_number'] = line_number
+                rows.append(row)
+            except RowError as exc:
+                self.reject(line_number, str(exc))
+
+        self.resolve_authors(row['author_email'] for row in rows)
+        ad_ids = self.existing_ad_ids(rows) if self.model is Review else None
+
+        loaded = []
+        for row in rows:
+            email = row.pop('author_email')
+            if email and email not in self.author_ids:
+                self.reject(row['line_number'], f'author_email: пользователь {email} не найден')
+                continue
+            if ad_ids is not None and row['ad_id'] not in ad_ids:
+                self.reject(row['line_number'], f'ad_id: объявление {row["ad_id"]} не найдено')
+                continue
+
+            row['author_id'] = self.author_ids.get(email)
+            row['updated_at'] = row['created_at']
+            loaded.append([row[column] for column in self.columns])
+
+        if loaded:
+            copy_rows(self.model, self.columns, loaded)
+            if self.model is Review:
+                self.review_ad_ids.update(row[self.columns.index('ad_id')] for row in loaded)
+        self.imported += len(loaded)
+        return len(loaded)
@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+
+from ads.cache import ads_list_cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики попаданий и промахов кэша списка объявлений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='обнулить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = ads_list_cache.get_stats()
+        requests = stats['hits'] + stats['misses']
+        hit_rate = stats['hits'] / requests * 100 if requests else 0
+
+        self.stdout.write(
+            f'Поколение: {stats["version"]}\n'
+            f'Попадания: {stats["hits"]}\n'
+            f'Промахи: {stats["misses"]}\n'
+            f'Доля попаданий: {hit_rate:.1f}%'
+        )
+
+        if options['reset']:
+            ads_list_cache.reset_stats()
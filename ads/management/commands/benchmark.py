@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError, call_command
+
+from ads.benchmark import HOT_SCENARIOS, SCENARIOS, compare_reports, run_benchmark, run_registration_benchmark
+from ads.models import Ad
+from ads.seeding import SEED_EMAIL_DOMAIN
+
+DATASETS = {
+    'small': {'users': 1000, 'ads': 10000, 'reviews': 30000},
+    'large': {'users': 100000, 'ads': 1000000, 'reviews': 3000000},
+}
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms')
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержку, пропускную способность и число SQL-запросов для всех маршрутов ads и users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='замеряемых запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=5, help='запросов на прогрев перед замером')
+        parser.add_argument('--max-seconds', type=float, default=30,
+                            help='сколько секунд замерять один сценарий, даже если --requests не набрано')
+        parser.add_argument('--only', nargs='+', default=(), help='запустить только сценарии с этими именами')
+        parser.add_argument('--dataset', choices=tuple(DATASETS),
+                            help='перед замером заполнить базу командой seed --clear заданного размера; '
+                                 'только для базы без объявлений, созданных не командой seed')
+        parser.add_argument('--output', default='benchmark.json', help='файл для отчета в формате JSON')
+        parser.add_argument('--compare', help='отчет-эталон; команда завершится ошибкой при регрессии')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='допустимое относительное ухудшение метрики, 0.2 - на 20%%')
+        parser.add_argument('--metric', choices=METRICS, default='p95_ms', help='метрика для сравнения')
+        parser.add_argument('--hot', nargs='+', default=HOT_SCENARIOS, help='сценарии, проверяемые при сравнении')
+        parser.add_argument('--registration-workers', type=int, default=0,
+                            help='замерить пропускную способность регистрации из стольких параллельных потоков')
+        parser.add_argument('--registration-requests', type=int, default=10,
+                            help='регистраций на один поток при замере --registration-workers')
+
+    def handle(self, *args, **options):
+        scenarios = [scenario for scenario in SCENARIOS if not options['only'] or scenario.name in options['only']]
+        if not scenarios:
+            raise CommandError(f'Нет сценариев {", ".join(options["only"])}')
+        if options['requests'] < 1:
+            raise CommandError('Нужен хотя бы один замеряемый запрос')
+
+        baseline = None
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text(encoding='utf-8'))
+
+        if options['dataset']:
+            if Ad.objects.exclude(author__email__endswith=f'@{SEED_EMAIL_DOMAIN}').exists():
+                raise CommandError('В базе есть объявления, созданные не командой seed: --dataset запускается только '
+                                   'на отдельной базе для замеров')
+            call_command('seed', clear=True, stdout=self.stdout, **DATASETS[options['dataset']])
+
+        self.stdout.write(f'{"сценарий":40} {"p50":>9} {"p95":>9} {"p99":>9} {"rps":>8} {"SQL":>6} {"ошибки":>6}')
+        report = run_benchmark(scenarios, options['requests'], options['warmup'], options['max_seconds'],
+                               self.progress)
+        report['dataset']['name'] = options['dataset']
+        if options['registration_workers'] > 0:
+            registration = run_registration_benchmark(options['registration_workers'],
+                                                      options['registration_requests'])
+            report['registration'] = registration
+            self.stdout.write(
+                f'регистрация, потоков {registration["workers"]}: {registration["throughput_rps"]} в секунду, '
+                f'{registration["throughput_per_worker_rps"]} на поток, p95 {registration["p95_ms"]} мс, '
+                f'ошибок {registration["errors"]}'
+            )
+
+        Path(options['output']).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(f'Отчет сохранен в {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare_reports(report, baseline, options['hot'], options['threshold'], options['metric'])
+            for name, previous, current in regressions:
+                self.stderr.write(f'{name}: {options["metric"]} {previous} -> {current} мс')
+            if regressions:
+                raise CommandError(f'Регрессия больше {options["threshold"]:.0%} по сравнению с {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS('Регрессий относительно эталона нет'))
+
+    def progress(self, name, result):
+        self.stdout.write(
+            f'{name:40} {result["p50_ms"]:9.2f} {result["p95_ms"]:9.2f} {result["p99_ms"]:9.2f} '
+            f'{result["throughput_rps"]:8.1f} {result["queries_per_request"]:6.1f} {result["errors"]:6}'
+        )
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from ads.export import EXPORT_MODELS, EXPORT_FORMATS, NDJSON, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает объявления или отзывы в CSV или NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=tuple(EXPORT_MODELS), help='что выгружать')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default=NDJSON, dest='export_format')
+        parser.add_argument('--after-id', type=int, default=0, help='продолжить выгрузку после записи с этим id')
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE, help='сколько строк читать из базы за раз')
+        parser.add_argument('--output', help='файл для записи, по умолчанию - стандартный вывод')
+
+    def handle(self, *args, **options):
+        chunks = iter_export(
+            options['name'],
+            options['export_format'],
+            after_id=options['after_id'],
+            chunk_size=options['chunk_size'],
+        )
+
+        if options['output']:
+            with open(options['output'], 'a' if options['after_id'] else 'w', encoding='utf-8', newline='') as file:
+                file.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
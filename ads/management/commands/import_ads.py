@@ -0,0 +1,64 @@
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+
+from ads.aggregates import recompute_ads_review_aggregates
+from ads.cache import ads_list_cache
+from ads.importer import Importer, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Быстро загружает объявления или отзывы из CSV или JSONL через COPY FROM STDIN'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл с данными (.csv или .jsonl)')
+        parser.add_argument('--model', choices=tuple(Importer.models), default='ads', help='что загружать')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), dest='file_format',
+                            help='формат файла, по умолчанию определяется по расширению')
+        parser.add_argument('--batch-size', type=int, default=10000, help='строк в одной команде COPY')
+        parser.add_argument('--max-errors', type=int, default=20, help='сколько ошибок показать')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        file_format = options['file_format'] or ('csv' if path.suffix.lower() == '.csv' else 'jsonl')
+
+        importer = Importer(options['model'], max_errors=options['max_errors'])
+        started = time.monotonic()
+        processed = 0
+
+        with path.open(encoding='utf-8', newline='') as file:
+            # номер строки данных считается с 1, заголовок CSV не учитывается
+            rows = enumerate(read_rows(file, file_format), start=1)
+            while batch := list(islice(rows, options['batch_size'])):
+                importer.load_batch(batch)
+                processed += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'обработано {processed}, загружено {importer.imported}, ошибок {importer.rejected}, '
+                    f'{processed / elapsed:.0f} строк/с'
+                )
+
+        if importer.imported:
+            if options['model'] == 'reviews':
+                self.recompute_aggregates(sorted(importer.review_ad_ids), options['batch_size'])
+            ads_list_cache.bump()
+
+        for line_number, message in importer.errors:
+            self.stderr.write(f'строка {line_number}: {message}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с: загружено {importer.imported}, отклонено {importer.rejected}, '
+            f'{importer.imported / elapsed if elapsed else 0:.0f} строк/с'
+        ))
+
+    def recompute_aggregates(self, ad_ids, batch_size):
+        """Пересчитывает количество отзывов и дату последнего отзыва только у объявлений, получивших отзывы"""
+        fixed = 0
+        for start in range(0, len(ad_ids), batch_size):
+            fixed += recompute_ads_review_aggregates(ad_ids[start:start + batch_size])
+        self.stdout.write(f'пересчитаны агрегаты отзывов у {len(ad_ids)} объявлений, исправлено {fixed}')
@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand
+from django.db.models import Max
+
+from ads.aggregates import recompute_review_aggregates
+from ads.cache import ads_list_cache
+from ads.models import Ad
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает количество отзывов и дату последнего отзыва у объявлений пакетами по id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='количество id объявлений в одном пакете')
+        parser.add_argument('--start-id', type=int, default=0, help='начать с объявлений с id больше указанного')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = Ad.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        start_id = options['start_id']
+        fixed = 0
+
+        while start_id < last_id:
+            end_id = min(start_id + batch_size, last_id)
+            updated = recompute_review_aggregates(start_id, end_id)
+            fixed += updated
+            self.stdout.write(f'id {start_id + 1}-{end_id}: исправлено {updated}')
+            start_id = end_id
+
+        if fixed:
+            ads_list_cache.bump()
+        self.stdout.write(self.style.SUCCESS(f'Готово, исправлено объявлений: {fixed}'))
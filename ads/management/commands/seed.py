@@ -0,0 +1,92 @@
+import time
+from contextlib import nullcontext
+from datetime import datetime, time as day_start
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ads.aggregates import recompute_ads_review_aggregates, recompute_review_aggregates
+from ads.cache import ads_list_cache
+from ads.models import Ad, Review
+from ads.seeding import SEED_EMAIL_DOMAIN, Seeder, clear_seeded_data, deferred_constraints
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими пользователями, объявлениями и отзывами для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='количество пользователей')
+        parser.add_argument('--ads', type=int, default=100000, help='количество объявлений')
+        parser.add_argument('--reviews', type=int, default=300000, help='количество отзывов')
+        parser.add_argument('--seed', type=int, default=0, help='зерно генератора случайных чисел')
+        parser.add_argument('--until', type=datetime.fromisoformat,
+                            help='дата самой поздней записи в формате ISO, по умолчанию начало текущего дня')
+        parser.add_argument('--years', type=int, default=3, help='за сколько лет распределены даты создания')
+        parser.add_argument('--author-exponent', type=float, default=1.1,
+                            help='показатель закона Ципфа для распределения объявлений и отзывов по авторам')
+        parser.add_argument('--review-exponent', type=float, default=1.0,
+                            help='показатель закона Ципфа для распределения отзывов по объявлениям')
+        parser.add_argument('--batch-size', type=int, default=50000, help='строк в одной команде COPY')
+        parser.add_argument('--clear', action='store_true',
+                            help='удалить ранее сгенерированных пользователей с их объявлениями и отзывами')
+        parser.add_argument('--password',
+                            help='пароль сгенерированных пользователей, по умолчанию они не могут войти')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['ads'] < 1 or options['reviews'] < 0:
+            raise CommandError('Нужен хотя бы один пользователь и одно объявление')
+
+        if options['clear']:
+            recompute_ads_review_aggregates(clear_seeded_data())
+        elif User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}').exists():
+            raise CommandError('В базе уже есть сгенерированные пользователи, запустите команду с --clear')
+
+        until = options['until'] or datetime.combine(timezone.localdate(), day_start())
+        if timezone.is_naive(until):
+            until = timezone.make_aware(until)
+
+        seeder = Seeder(
+            seed=options['seed'],
+            until=until,
+            years=options['years'],
+            author_exponent=options['author_exponent'],
+            review_exponent=options['review_exponent'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+        )
+        self.started = time.monotonic()
+
+        # сгенерированных данных к этому моменту нет, поэтому любые строки в таблицах - чужие данные: снимать
+        # с них индексы и внешние ключи на все время загрузки нельзя
+        other_data = Ad.objects.exists() or Review.objects.exists()
+        if other_data:
+            self.stdout.write('в базе есть другие объявления или отзывы, индексы и внешние ключи не снимаются')
+
+        user_ids = seeder.insert(User, seeder.user_columns, seeder.users(options['users']), self.progress)
+        with nullcontext() if other_data else deferred_constraints(Ad, Review):
+            ad_ids = seeder.insert(Ad, seeder.ad_columns, seeder.ads(options['ads'], user_ids), self.progress)
+            seeder.insert(Review, seeder.review_columns, seeder.reviews(options['reviews'], ad_ids, user_ids),
+                          self.progress)
+            if not other_data:
+                self.stdout.write(f'создание индексов и внешних ключей, {time.monotonic() - self.started:.1f} с')
+        if options['reviews']:
+            recompute_review_aggregates(ad_ids[0] - 1, ad_ids[-1])
+
+        with connection.cursor() as cursor:
+            for model in (User, Ad, Review):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+        ads_list_cache.bump()
+
+        total = options['users'] + options['ads'] + options['reviews']
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с: пользователей {options["users"]}, объявлений {options["ads"]}, '
+            f'отзывов {options["reviews"]}, {total / elapsed if elapsed else 0:.0f} строк/с'
+        ))
+
+    def progress(self, model, count):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {count}, {elapsed:.1f} с')
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:43
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ads', '0004_alter_ad_author_alter_review_author'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(fields=['-created_at', '-id'], name='ad_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:44
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ads', '0005_ad_created_at_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(fields=['price', 'id'], name='ad_price_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='ad_author_created_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(fields=['author', 'price', 'id'], name='ad_author_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(fields=['title', '-created_at', '-id'], name='ad_title_created_at_idx'),
+        ),
+    ]
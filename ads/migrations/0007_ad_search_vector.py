@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ads', '0006_ad_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ad',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='russian', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='russian', weight='B'), django.contrib.postgres.search.SearchConfig('russian')), output_field=django.contrib.postgres.search.SearchVectorField(), verbose_name='поисковый вектор'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='ad_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:46
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ads', '0007_ad_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='ad_title_trgm_idx'),
+        ),
+    ]
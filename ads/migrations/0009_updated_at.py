@@ -0,0 +1,35 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:48
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ads', '0008_ad_title_trgm_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ad',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='дата изменения'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(fields=['-updated_at'], name='ad_updated_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='review',
+            index=models.Index(fields=['-updated_at'], name='review_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:50
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import Max
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_review_aggregates(apps, schema_editor):
+    """Заполняет review_count и last_review_at у существующих объявлений пакетами по id, каждый в своей транзакции"""
+    from ads.aggregates import recompute_review_aggregates
+
+    last_id = apps.get_model('ads', 'Ad').objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+    for start_id in range(0, last_id, BACKFILL_BATCH_SIZE):
+        recompute_review_aggregates(start_id, start_id + BACKFILL_BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ads', '0009_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ad',
+            name='last_review_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='дата последнего отзыва'),
+        ),
+        migrations.AddField(
+            model_name='ad',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='количество отзывов'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(models.OrderBy(models.F('last_review_at'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='ad_last_review_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='review',
+            index=models.Index(fields=['ad', '-created_at'], name='review_ad_created_at_idx'),
+        ),
+        migrations.RunPython(backfill_review_aggregates, migrations.RunPython.noop),
+    ]
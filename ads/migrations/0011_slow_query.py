@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0010_review_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата')),
+                ('duration_ms', models.FloatField(verbose_name='длительность, мс')),
+                ('sql', models.TextField(verbose_name='запрос')),
+                ('params', models.TextField(blank=True, verbose_name='параметры')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='view')),
+                ('stack', models.TextField(blank=True, verbose_name='стек вызова')),
+                ('plan', models.JSONField(blank=True, null=True, verbose_name='план выполнения')),
+            ],
+            options={
+                'verbose_name': 'медленный запрос',
+                'verbose_name_plural': 'медленные запросы',
+                'ordering': ('-created_at',),
+                'indexes': [models.Index(fields=['-created_at'], name='slow_query_created_at_idx')],
+            },
+        ),
+    ]
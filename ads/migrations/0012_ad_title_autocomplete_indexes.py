@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-18 19:10
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ads', '0011_slow_query'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='ad',
+            name='ad_title_trgm_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=django.contrib.postgres.indexes.GistIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gist_trgm_ops'), name='ad_title_trgm_gist_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ad',
+            index=models.Index(django.db.models.functions.comparison.Collate(django.db.models.functions.text.Upper('title'), 'C'), name='ad_title_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 19:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ads', '0012_ad_title_autocomplete_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # AlterField пересоздал бы внешний ключ с проверкой всех строк, поэтому в базе удаляется только индекс
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "ads_ad_author_id_57b8bdcb"',
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "ads_ad_author_id_57b8bdcb" ON "ads_ad" ("author_id")',
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='ad',
+                    name='author',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ad', to=settings.AUTH_USER_MODEL, verbose_name='автор объявления'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,165 @@
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import exceptions
+from rest_framework.response import Response
+
+from ads.cache import ads_list_cache
+
+
+def make_etag(request, *parts):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    fmt = request.accepted_renderer.format if hasattr(request, 'accepted_renderer') else ''
+    value = ':'.join(str(part) for part in (*parts, query, fmt))
+    return quote_etag(md5(value.encode(), usedforsecurity=False).hexdigest())
+
+
+class AnonymousListCacheMixin:
+    """Отдает анонимным пользователям закэшированные данные страницы списка вместе с ее ETag"""
+    list_cache = ads_list_cache
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+
+        key = self.list_cache.make_key(request)
+        cached = self.list_cache.get(key)
+        if cached is not None:
+            data, etag = cached
+            response = get_conditional_response(request, etag=etag) or Response(data)
+            if etag:
+                response['ETag'] = etag
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.list_cache.set(key, (response.data, response.get('ETag')))
+        return response
+
+
+class ConditionalListMixin:
+    """Отвечает 304 на If-None-Match по ETag из id и updated_at записей текущей страницы и общего количества записей.
+
+    Валидаторы берутся из уже загруженной страницы и COUNT(*) пагинатора, отдельных запросов для них нет;
+    при совпадении ETag пропускается сериализация. Last-Modified для списков не отдается: удаление записи может
+    уменьшить максимальную дату изменения.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+
+        paginator_page = getattr(self.paginator, 'page', None)
+        count = getattr(getattr(paginator_page, 'paginator', None), 'count', None)
+        etag = make_etag(request, count, *(f'{row.pk}@{row.updated_at.isoformat()}' for row in rows))
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        data = self.get_serializer(rows, many=True).data
+        response = Response(data) if page is None else self.get_paginated_response(data)
+        response['ETag'] = etag
+        return response
+
+
+class ConditionalRetrieveMixin:
+    """Отвечает 304 на условный GET по ETag и Last-Modified из updated_at, не загружая объект целиком"""
+    validator_fields = ('updated_at', 'author')
+
+    def get_validator_object(self):
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).only(*self.validator_fields)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def retrieve(self, request, *args, **kwargs):
+        obj = self.get_validator_object()
+        etag = make_etag(request, obj.pk, obj.updated_at.isoformat())
+        last_modified = int(obj.updated_at.timestamp())
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            not_modified['Last-Modified'] = http_date(last_modified)
+            return not_modified
+
+        instance = get_object_or_404(self.filter_queryset(self.get_queryset()), pk=obj.pk)
+        response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class ExpandMixin:
+    """Встраивает связанные объекты из параметра ?expand=, загружая их через select_related,
+    а для связей многие-ко-многим - через prefetch_related"""
+    expandable_fields = ('author',)
+
+    def get_expand(self):
+        if not hasattr(self, '_expand'):
+            expand = [name for name in self.request.query_params.get('expand', '').split(',') if name]
+            unknown = set(expand) - set(self.expandable_fields)
+            if unknown:
+                message = f'Можно раскрыть только: {", ".join(self.expandable_fields)}'
+                raise exceptions.ValidationError({'expand': message})
+            self._expand = tuple(expand)
+        return self._expand
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        expand = self.get_expand()
+        many = [name for name in expand if queryset.model._meta.get_field(name).many_to_many]
+        single = [name for name in expand if name not in many]
+        if single:
+            queryset = queryset.select_related(*single)
+        if many:
+            queryset = queryset.prefetch_related(*many)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
+
+
+class SparseFieldsetMixin:
+    """Ограничивает ответ полями из параметра ?fields= и загружает из базы только соответствующие колонки.
+
+    Вычисляемые в базе поля из annotated_fields добавляются в запрос, только если они запрошены.
+    """
+    required_model_fields = ()
+    annotated_fields = {}
+
+    def get_fields_param(self):
+        if not hasattr(self, '_fields_param'):
+            fields = [name for name in self.request.query_params.get('fields', '').split(',') if name]
+            unknown = set(fields) - set(self.get_serializer_class()().fields)
+            if unknown:
+                raise exceptions.ValidationError({'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}'})
+            self._fields_param = tuple(fields)
+        return self._fields_param
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_fields_param()
+        if fields:
+            model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+            expand = self.get_expand() if hasattr(self, 'get_expand') else ()
+            loaded = {*fields, *expand, *self.required_model_fields} & model_fields
+            queryset = queryset.only('pk', *loaded)
+
+        annotations = {name: expression for name, expression in self.annotated_fields.items()
+                       if not fields or name in fields}
+        return queryset.annotate(**annotations) if annotations else queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_fields_param()
+        return context
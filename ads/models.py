@@ -1,8 +1,18 @@
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Collate, Upper
 
 from users.models import User
 
 
+class AdManager(models.Manager):
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
 class Ad(models.Model):
     """Модель объявления с полями названия, цены, описания, даты создания и автора"""
 
@@ -10,14 +20,42 @@ class Ad(models.Model):
     price = models.PositiveIntegerField(verbose_name='стоимость товара')
     description = models.TextField(verbose_name='описание', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='дата изменения')
+    review_count = models.PositiveIntegerField(default=0, verbose_name='количество отзывов')
+    last_review_at = models.DateTimeField(verbose_name='дата последнего отзыва', blank=True, null=True)
 
+    # отдельный индекс по author_id не нужен: поиск по автору идет по ad_author_created_at_idx
     author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='автор объявления', related_name='ad',
-                               blank=True, null=True)
+                               blank=True, null=True, db_index=False)
+
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('title', weight='A', config='russian')
+            + SearchVector('description', weight='B', config='russian')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        verbose_name='поисковый вектор',
+    )
+
+    objects = AdManager()
 
     class Meta:
         verbose_name = 'объявление'
         verbose_name_plural = 'объявления'
         ordering = ('-created_at',)
+        indexes = (
+            models.Index(fields=('-created_at', '-id'), name='ad_created_at_id_idx'),
+            models.Index(fields=('price', 'id'), name='ad_price_id_idx'),
+            models.Index(fields=('author', '-created_at', '-id'), name='ad_author_created_at_idx'),
+            models.Index(fields=('author', 'price', 'id'), name='ad_author_price_idx'),
+            models.Index(fields=('title', '-created_at', '-id'), name='ad_title_created_at_idx'),
+            GinIndex(fields=('search_vector',), name='ad_search_vector_idx'),
+            GistIndex(OpClass(Upper('title'), name='gist_trgm_ops'), name='ad_title_trgm_gist_idx'),
+            models.Index(Collate(Upper('title'), 'C'), name='ad_title_prefix_idx'),
+            models.Index(fields=('-updated_at',), name='ad_updated_at_idx'),
+            models.Index(F('last_review_at').desc(nulls_last=True), F('id').desc(), name='ad_last_review_at_idx'),
+        )
 
     def __str__(self):
         return f'{self.title}, цена: {self.price}'
@@ -28,6 +66,7 @@ class Review(models.Model):
 
     text = models.TextField(verbose_name='содержание отзыва')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='дата изменения')
 
     ad = models.ForeignKey(Ad, on_delete=models.CASCADE, verbose_name='объявление', related_name='review')
     author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='автор отзыва', related_name='review',
@@ -36,6 +75,33 @@ class Review(models.Model):
     class Meta:
         verbose_name = 'отзыв'
         verbose_name_plural = 'отзывы'
+        indexes = (
+            models.Index(fields=('-updated_at',), name='review_updated_at_idx'),
+            models.Index(fields=('ad', '-created_at'), name='review_ad_created_at_idx'),
+        )
 
     def __str__(self):
         return f'Отзыв от {self.author} на {self.ad}: {self.text}'
+
+
+class SlowQuery(models.Model):
+    """Модель медленного SQL-запроса с параметрами, view, стеком вызова и планом выполнения"""
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата')
+    duration_ms = models.FloatField(verbose_name='длительность, мс')
+    sql = models.TextField(verbose_name='запрос')
+    params = models.TextField(verbose_name='параметры', blank=True)
+    view = models.CharField(max_length=200, verbose_name='view', blank=True)
+    stack = models.TextField(verbose_name='стек вызова', blank=True)
+    plan = models.JSONField(verbose_name='план выполнения', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'медленный запрос'
+        verbose_name_plural = 'медленные запросы'
+        ordering = ('-created_at',)
+        indexes = (
+            models.Index(fields=('-created_at',), name='slow_query_created_at_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.duration_ms:.0f} мс: {self.sql[:80]}'
@@ -1,7 +1,105 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import b64decode, b64encode
+from collections import namedtuple
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+KeysetCursor = namedtuple('KeysetCursor', ['created_at', 'pk', 'reverse'])
 
 
 class AdsPagination(PageNumberPagination):
     page_size = 4
     page_size_query_param = 'page_size'
     max_page_size = 20
+
+
+class AdsCursorPagination(CursorPagination):
+    """Keyset-пагинация ленты объявлений по паре (created_at, id).
+
+    Страница выбирается условием по ключу крайней записи соседней страницы, без COUNT(*) и OFFSET,
+    поэтому стоимость запроса не зависит от глубины, а новые объявления не сдвигают выданные страницы.
+    """
+    page_size = 4
+    page_size_query_param = 'page_size'
+    max_page_size = 20
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        if reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+
+        if self.cursor is not None:
+            created_at, pk = self.cursor.created_at, self.cursor.pk
+            if reverse:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(id__gt=pk), created_at__gte=created_at)
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at)
+
+        results = list(queryset[:self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        return self.encode_cursor(KeysetCursor(created_at=last.created_at, pk=last.pk, reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        first = self.page[0]
+        return self.encode_cursor(KeysetCursor(created_at=first.created_at, pk=first.pk, reverse=True))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            created_at = parse_datetime(tokens['c'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return KeysetCursor(created_at=created_at, pk=pk, reverse=reverse)
+
+    def encode_cursor(self, cursor):
+        tokens = {'c': cursor.created_at.isoformat(), 'i': cursor.pk}
+        if cursor.reverse:
+            tokens['r'] = '1'
+
+        querystring = parse.urlencode(tokens)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+
+from django.db import connection
+
+from ads.models import Ad, Review
+from ads.slow_queries import explain, plan_nodes
+from users.models import User
+
+# Таблицы, которые в продакшене слишком велики для полного чтения или сортировки в памяти
+LARGE_TABLES = (Ad._meta.db_table, Review._meta.db_table, User._meta.db_table)
+
+SEQ_SCAN_NODES = ('Seq Scan', 'Parallel Seq Scan')
+SORT_NODES = ('Sort', 'Incremental Sort')
+
+# Сортировку нескольких строк, найденных по индексу, дешевле сделать в памяти, чем читать индекс в нужном порядке
+SORT_ROWS_LIMIT = 1000
+
+# Запросы, которым разрешено полностью читать большую таблицу, и причина. Сравнивается весь текст SQL,
+# поэтому тот же COUNT(*) с условиями фильтра проверяется как обычно.
+FULL_SCAN_ALLOWED = {
+    'SELECT COUNT(*) AS "__count" FROM "ads_ad"': (
+        'число объявлений для AdsPagination в /ads/: точный COUNT(*) PostgreSQL считает только полным чтением '
+        'таблицы или индекса; без него работает лента /ads/feed/'
+    ),
+}
+
+
+class QueryCapture:
+    """execute_wrapper, который запоминает SQL и параметры выполненных SELECT-запросов"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def node_tables(node):
+    """Таблицы, которые читает узел плана и его потомки"""
+    return {item['Relation Name'] for item in plan_nodes([{'Plan': node}]) if 'Relation Name' in item}
+
+
+def plan_problems(plan, large_tables=LARGE_TABLES, sort_rows_limit=SORT_ROWS_LIMIT):
+    """Последовательные чтения больших таблиц и сортировки больше sort_rows_limit их строк
+    в плане EXPLAIN (FORMAT JSON)"""
+    problems = []
+    for node in plan_nodes(plan):
+        node_type = node['Node Type']
+        if node_type in SEQ_SCAN_NODES and node.get('Relation Name') in large_tables:
+            problems.append(f'{node_type} по {node["Relation Name"]}')
+        elif node_type in SORT_NODES and node['Plan Rows'] > sort_rows_limit:
+            tables = sorted(node_tables(node) & set(large_tables))
+            if tables:
+                problems.append(f'{node_type} ({", ".join(node.get("Sort Key", ()))}) по {", ".join(tables)}')
+    return problems
+
+
+class IndexedQueriesTestMixin:
+    """Проверка для тестов на заполненной базе: SELECT-запросы блока выполняются по индексам.
+
+    Каждый запрос разбирается через EXPLAIN; тест падает, если в плане есть Seq Scan по большой таблице
+    или сортировка больше sort_rows_limit ее строк. Статистика таблиц должна быть собрана (ANALYZE), иначе планировщик ошибается.
+    Запросы из full_scan_allowed не проверяются.
+    """
+    large_tables = LARGE_TABLES
+    sort_rows_limit = SORT_ROWS_LIMIT
+    full_scan_allowed = FULL_SCAN_ALLOWED
+
+    @contextmanager
+    def assertQueriesUseIndexes(self):
+        capture = QueryCapture()
+        with connection.execute_wrapper(capture):
+            yield capture
+
+        self.assertTrue(capture.queries, 'Не выполнено ни одного SELECT-запроса')
+        problems = [
+            f'{problem}: {sql}'
+            for sql, params in capture.queries if sql.strip() not in self.full_scan_allowed
+            for problem in plan_problems(explain(sql, params), self.large_tables, self.sort_rows_limit)
+        ]
+        if problems:
+            self.fail('Запросы без индекса:\n' + '\n'.join(problems))
@@ -0,0 +1,232 @@
+import math
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.db.models import Max
+
+from ads.importer import copy_rows
+from ads.models import Ad, Review
+from users.models import User
+
+SEED_EMAIL_DOMAIN = 'seed.example'
+
+# Множитель для перестановки рангов: самый популярный автор или объявление не должны совпадать с первым id
+PERMUTATION_MULTIPLIER = 2654435761
+
+ADJECTIVES = (
+    'новый', 'почти новый', 'б/у', 'отличный', 'надежный', 'компактный', 'большой', 'легкий', 'мощный',
+    'детский', 'винтажный', 'кожаный', 'деревянный', 'складной', 'электрический', 'беспроводной',
+)
+NOUNS = (
+    'телефон', 'ноутбук', 'велосипед', 'диван', 'холодильник', 'стол', 'шкаф', 'самокат', 'телевизор',
+    'пылесос', 'фотоаппарат', 'рюкзак', 'чайник', 'монитор', 'планшет', 'кресло', 'коляска', 'гитара',
+    'принтер', 'микроволновка', 'палатка', 'куртка', 'ботинки', 'часы', 'наушники', 'колонка',
+)
+WORDS = NOUNS + ADJECTIVES + (
+    'продаю', 'срочно', 'торг', 'состояние', 'комплект', 'гарантия', 'доставка', 'самовывоз', 'документы',
+    'коробка', 'работает', 'царапины', 'пользовались', 'аккуратно', 'переезд', 'обмен', 'звоните', 'пишите',
+    'метро', 'центр', 'цена', 'окончательная', 'без', 'с', 'в', 'на', 'и', 'для', 'очень', 'год', 'месяц',
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Петр', 'Елена', 'Олег', 'Ольга', 'Сергей', 'Дарья', 'Никита')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Новиков', 'Морозов')
+
+
+def zipf_index(rng, n, exponent):
+    """Случайный ранг 0..n-1 с вероятностью ~ 1 / (ранг + 1) ** exponent (обратная функция непрерывного закона)"""
+    u = rng.random()
+    if exponent == 1:
+        rank = math.exp(u * math.log(n + 1))
+    else:
+        power = 1 - exponent
+        rank = ((n + 1) ** power - 1) * u + 1
+        rank = rank ** (1 / power)
+    return min(int(rank) - 1, n - 1)
+
+
+def permutation(n):
+    """Биекция 0..n-1 -> 0..n-1 без хранения перестановки в памяти"""
+    multiplier = PERMUTATION_MULTIPLIER
+    while math.gcd(multiplier, n) != 1:
+        multiplier += 2
+    return lambda index: index * multiplier % n
+
+
+class Seeder:
+    """Детерминированно генерирует пользователей, объявления и отзывы и записывает их пачками через COPY.
+
+    Все случайные величины берутся из одного генератора с заданным seed, а даты отсчитываются от until,
+    поэтому одинаковые параметры дают одинаковые данные.
+    """
+    user_columns = ('password', 'is_superuser', 'is_staff', 'is_active', 'date_joined', 'email', 'first_name',
+                    'last_name', 'role', 'token')
+    ad_columns = ('title', 'price', 'description', 'created_at', 'updated_at', 'review_count', 'author_id')
+    review_columns = ('text', 'ad_id', 'created_at', 'updated_at', 'author_id')
+
+    def __init__(self, seed, until, years=3, author_exponent=1.1, review_exponent=1.0, batch_size=50000,
+                 password=None):
+        self.rng = random.Random(seed)
+        self.until = until
+        self.since = until - timedelta(days=365 * years)
+        self.author_exponent = author_exponent
+        self.review_exponent = review_exponent
+        self.batch_size = batch_size
+        # без пароля сгенерированные пользователи не могут войти
+        self.password = make_password(password)
+        self.corpus = ' '.join(self.rng.choice(WORDS) for _ in range(200000))
+
+    def batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def insert(self, model, columns, rows, progress=None):
+        """Записывает строки пачками по batch_size и возвращает id вставленных записей"""
+        first_id = (model.objects.aggregate(last_id=Max('pk'))['last_id'] or 0) + 1
+        count = 0
+        for batch in self.batches(rows):
+            copy_rows(model, columns, batch)
+            count += len(batch)
+            if progress:
+                progress(model, count)
+
+        ids = range(first_id, first_id + count)
+        # id идут подряд, если в таблицу никто не писал параллельно; иначе читаем их из базы
+        last_id = model.objects.aggregate(last_id=Max('pk'))['last_id']
+        if count and last_id != ids[-1]:
+            ids = list(model.objects.filter(pk__gte=first_id).order_by('pk').values_list('pk', flat=True))
+        return ids
+
+    def created_at(self, index, count):
+        """Дата создания растет вместе с index, причем ближе к until записей становится больше"""
+        return self.since + (self.until - self.since) * math.sqrt((index + 0.5) / count)
+
+    def text(self, length):
+        start = self.corpus.find(' ', self.rng.randrange(len(self.corpus) - length)) + 1
+        return self.corpus[start:start + length].strip().capitalize()
+
+    def description(self):
+        if self.rng.random() < 0.15:
+            return None
+        # длина описаний с длинным хвостом: медиана около 150 символов, редкие описания до 5000
+        return self.text(min(int(self.rng.lognormvariate(5, 1)) + 10, 5000))
+
+    def users(self, count):
+        rng = self.rng
+        for index in range(count):
+            date_joined = self.since + (self.until - self.since) * rng.random()
+            yield (
+                self.password, False, False, True, date_joined, f'user{index}@{SEED_EMAIL_DOMAIN}',
+                rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), User.USER, '',
+            )
+
+    def ads(self, count, user_ids):
+        rng = self.rng
+        author = permutation(len(user_ids))
+        for index in range(count):
+            created_at = self.created_at(index, count)
+            yield (
+                f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'.capitalize(),
+                int(rng.lognormvariate(8, 1.5)) // 10 * 10,
+                self.description(),
+                created_at,
+                created_at,
+                0,
+                user_ids[author(zipf_index(rng, len(user_ids), self.author_exponent))],
+            )
+
+    def reviews(self, count, ad_ids, user_ids):
+        rng = self.rng
+        ad = permutation(len(ad_ids))
+        author = permutation(len(user_ids))
+        for _ in range(count):
+            index = ad(zipf_index(rng, len(ad_ids), self.review_exponent))
+            ad_created_at = self.created_at(index, len(ad_ids))
+            # большинство отзывов приходит вскоре после публикации объявления
+            created_at = ad_created_at + (self.until - ad_created_at) * rng.random() ** 3
+            yield (
+                self.text(rng.randint(20, 300)),
+                ad_ids[index],
+                created_at,
+                created_at,
+                user_ids[author(zipf_index(rng, len(user_ids), self.author_exponent))],
+            )
+
+
+def clear_seeded_data():
+    """Удаляет пользователей, созданных командой seed, их объявления и отзывы; остальные данные не затрагиваются.
+
+    Возвращает id оставшихся объявлений, у которых были отзывы сгенерированных пользователей: их агрегаты
+    отзывов нужно пересчитать.
+    """
+    users = User._meta.db_table
+    ads = Ad._meta.db_table
+    reviews = Review._meta.db_table
+    seeded_users = f'SELECT id FROM {users} WHERE email LIKE %s'
+    pattern = f'%@{SEED_EMAIL_DOMAIN}'
+
+    with connection.cursor() as cursor:
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(
+            f'SELECT DISTINCT review.ad_id FROM {reviews} AS review JOIN {ads} AS ad ON ad.id = review.ad_id '
+            f'WHERE review.author_id IN ({seeded_users}) '
+            f'AND (ad.author_id IS NULL OR ad.author_id NOT IN ({seeded_users}))',
+            [pattern, pattern],
+        )
+        touched_ad_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            f'DELETE FROM {reviews} WHERE author_id IN ({seeded_users}) '
+            f'OR ad_id IN (SELECT id FROM {ads} WHERE author_id IN ({seeded_users}))',
+            [pattern, pattern],
+        )
+        cursor.execute(f'DELETE FROM {ads} WHERE author_id IN ({seeded_users})', [pattern])
+        for field in User._meta.many_to_many:
+            through = field.remote_field.through._meta.db_table
+            cursor.execute(f'DELETE FROM {through} WHERE user_id IN ({seeded_users})', [pattern])
+        cursor.execute(f'DELETE FROM {users} WHERE email LIKE %s', [pattern])
+    return touched_ad_ids
+
+
+@contextmanager
+def deferred_constraints(*models):
+    """Снимает внешние ключи и неуникальные индексы на время загрузки и создает их заново одним проходом.
+
+    Проверка внешнего ключа и обновление индексов на каждую строку обходятся дороже самой вставки,
+    а построение индекса и проверка ограничения по готовой таблице выполняются за одно сканирование.
+    """
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        # отложенные проверки внешних ключей Django мешают ALTER TABLE и TRUNCATE внутри транзакции
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = ANY(%s::regclass[]) AND contype = 'f'",
+            [tables],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            'SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index '
+            'WHERE indrelid = ANY(%s::regclass[]) AND NOT indisprimary AND NOT indisunique',
+            [tables],
+        )
+        indexes = cursor.fetchall()
+
+        for table, name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {name}')
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {name}')
+
+    yield
+
+    with connection.cursor() as cursor:
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for table, name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
@@ -1,17 +1,92 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from ads.models import Ad, Review
+from users.serializers import UserSummarySerializer
 
 
-class AdSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Оставляет в сериализаторе только поля, перечисленные в контексте под ключом fields"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class AdSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Ad
-        fields = '__all__'
+        exclude = ('search_vector',)
+        read_only_fields = ('review_count', 'last_review_at')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'author' in self.context.get('expand', ()):
+            self.fields['author'] = UserSummarySerializer(read_only=True)
+
+
+class AdCreateSerializer(AdSerializer):
+
+    class Meta(AdSerializer.Meta):
+        read_only_fields = ('review_count', 'last_review_at', 'author')
+
+
+class AdBulkCreateSerializer(serializers.ListSerializer):
+    """Проверяет объявления по отдельности: ошибки в одних не мешают сохранить остальные одним bulk_create"""
 
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('child', AdCreateSerializer())
+        kwargs.setdefault('allow_empty', False)
+        kwargs.setdefault('max_length', settings.ADS_BULK_CREATE_MAX_ITEMS)
+        super().__init__(*args, **kwargs)
+        self.item_errors = {}
+        self.valid_indexes = []
 
-class ReviewSerializer(serializers.ModelSerializer):
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            message = self.error_messages['not_a_list'].format(input_type=type(data).__name__)
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]}, code='not_a_list')
+        if not data:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [self.error_messages['empty']]},
+                                              code='empty')
+        if len(data) > self.max_length:
+            message = self.error_messages['max_length'].format(max_length=self.max_length)
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]}, code='max_length')
+
+        validated = []
+        for index, item in enumerate(data):
+            try:
+                validated.append(self.child.run_validation(item))
+                self.valid_indexes.append(index)
+            except serializers.ValidationError as exc:
+                self.item_errors[index] = exc.detail
+        return validated
+
+    def create(self, validated_data):
+        ads = [Ad(**attrs) for attrs in validated_data]
+        return Ad.objects.bulk_create(ads, batch_size=self.context.get('batch_size'))
+
+
+class AdListSerializer(AdSerializer):
+    description_excerpt = serializers.CharField(read_only=True)
+
+    class Meta(AdSerializer.Meta):
+        exclude = ('search_vector', 'description')
+
+
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Review
         fields = '__all__'
+
+
+class AdAutocompleteQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=300)
+    limit = serializers.IntegerField(min_value=1, max_value=settings.ADS_AUTOCOMPLETE_MAX_LIMIT,
+                                     default=settings.ADS_AUTOCOMPLETE_LIMIT)
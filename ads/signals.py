@@ -0,0 +1,18 @@
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from ads.cache import ads_list_cache
+from ads.models import Ad
+from ads.slow_queries import install_slow_query_wrapper
+
+
+@receiver(post_save, sender=Ad)
+@receiver(post_delete, sender=Ad)
+def invalidate_ads_list_cache(sender, **kwargs):
+    ads_list_cache.bump()
+
+
+connection_created.connect(install_slow_query_wrapper)
+install_slow_query_wrapper(sender=None, connection=connection)
@@ -0,0 +1,161 @@
+import json
+import logging
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models.sql import InsertQuery
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+current_view = ContextVar('current_view', default='')
+capturing = threading.local()
+handler_lock = threading.Lock()
+
+
+def get_logger():
+    """Логгер с ротацией файла SLOW_QUERY_LOG_FILE; обработчик создается при первой записи"""
+    with handler_lock:
+        if not logger.handlers:
+            path = Path(settings.SLOW_QUERY_LOG_FILE)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                                          backupCount=settings.SLOW_QUERY_LOG_BACKUP_COUNT, encoding='utf-8')
+            logger.addHandler(handler)
+            logger.setLevel(logging.WARNING)
+    return logger
+
+
+def project_stack(limit=15):
+    """Кадры стека из кода проекта, без Django и других библиотек"""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+    ]
+    return ''.join(traceback.format_list(frames[-limit:]))
+
+
+def plan_nodes(plan):
+    """Все узлы плана EXPLAIN (FORMAT JSON) вместе с вложенными"""
+    nodes = [item['Plan'] for item in plan or ()]
+    while nodes:
+        node = nodes.pop()
+        yield node
+        nodes.extend(node.get('Plans', ()))
+
+
+def plan_node_types(plan):
+    """Типы узлов плана EXPLAIN (FORMAT JSON), например Seq Scan или Index Scan"""
+    for node in plan_nodes(plan):
+        yield node['Node Type']
+
+
+@contextmanager
+def raw_cursor():
+    """Курсор DB-API в обход execute_wrappers: служебные запросы журнала не попадают в бюджеты и метрики запроса.
+
+    Внутри транзакции запросы выполняются в точке сохранения, поэтому их ошибка не прерывает транзакцию.
+    """
+    cursor = connection.cursor().cursor
+    in_transaction = not connection.get_autocommit()
+    try:
+        with connection.wrap_database_errors:
+            if in_transaction:
+                cursor.execute('SAVEPOINT slow_query_log')
+            try:
+                yield cursor
+            except Exception:
+                if in_transaction:
+                    cursor.execute('ROLLBACK TO SAVEPOINT slow_query_log')
+                raise
+            if in_transaction:
+                cursor.execute('RELEASE SAVEPOINT slow_query_log')
+    finally:
+        cursor.close()
+
+
+def explain(sql, params):
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    with raw_cursor() as cursor:
+        cursor.execute(f'EXPLAIN (ANALYZE off, FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+def save_slow_query(entry):
+    from ads.models import SlowQuery
+
+    slow_query = SlowQuery(**entry)
+    query = InsertQuery(SlowQuery)
+    query.insert_values([field for field in SlowQuery._meta.concrete_fields if not field.primary_key], [slow_query])
+    for sql, params in query.get_compiler(connection=connection).as_sql():
+        with raw_cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def record_slow_query(sql, params, duration):
+    entry = {
+        'duration_ms': round(duration * 1000, 3),
+        'sql': sql,
+        'params': json.dumps(params, ensure_ascii=False, default=str),
+        'view': current_view.get(),
+        'stack': project_stack(),
+        'plan': None,
+    }
+    try:
+        entry['plan'] = explain(sql, params)
+        save_slow_query(entry)
+    except DatabaseError as exc:
+        entry['error'] = str(exc)
+    get_logger().warning(json.dumps(entry, ensure_ascii=False))
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """execute_wrapper: запросы дольше SLOW_QUERY_THRESHOLD_MS записываются с планом EXPLAIN в лог и в SlowQuery"""
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold is None or getattr(capturing, 'active', False):
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+
+    if duration * 1000 >= threshold and not many and not connection.needs_rollback:
+        capturing.active = True
+        try:
+            record_slow_query(sql, params, duration)
+        finally:
+            capturing.active = False
+    return result
+
+
+def install_slow_query_wrapper(sender, connection, **kwargs):
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+class SlowQueryMiddleware:
+    """Запоминает имя view текущего запроса, чтобы приписать к нему медленные SQL-запросы"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set(request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_view.set(request.resolver_match.view_name)
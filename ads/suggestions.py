@@ -0,0 +1,82 @@
+import logging
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordDistance
+from django.db import OperationalError, connection, transaction
+from django.db.models.functions import Collate, Upper
+from psycopg2.errors import QueryCanceled
+
+from ads.cache import LRUCache
+from ads.models import Ad
+
+# более короткий текст ищется только как префикс: для поиска с опечатками в нем слишком мало триграмм
+TRIGRAM_MIN_LENGTH = 3
+
+logger = logging.getLogger(__name__)
+
+suggestions_cache = LRUCache(
+    maxsize=settings.ADS_AUTOCOMPLETE_CACHE_SIZE,
+    ttl=settings.ADS_AUTOCOMPLETE_CACHE_TTL,
+)
+
+
+def normalize_prefix(text):
+    return ' '.join(text.lower().split())
+
+
+def prefix_suggestions(prefix, limit):
+    """Названия, начинающиеся с prefix, в алфавитном порядке: диапазон btree-индекса ad_title_prefix_idx"""
+    return list(
+        Ad.objects.annotate(upper_title=Collate(Upper('title'), 'C'))
+        .filter(upper_title__startswith=prefix.upper())
+        .order_by('upper_title')
+        .values('id', 'title', 'price')[:limit]
+    )
+
+
+def similar_suggestions(prefix, limit):
+    """Названия, ближайшие к prefix по word_similarity.
+
+    GiST-индекс ad_title_trgm_gist_idx отбирает только названия с похожестью не ниже ADS_AUTOCOMPLETE_SIMILARITY
+    (оператор %>, порог задается на время транзакции) и отдает их в порядке расстояния (KNN, оператор <<->).
+    На названиях с множеством повторов обход индекса все равно может занять сотни миллисекунд, поэтому запрос
+    ограничен ADS_AUTOCOMPLETE_FUZZY_TIMEOUT_MS: при отмене по таймауту похожие названия не добавляются.
+    """
+    text = prefix.upper()
+    nearest = (
+        Ad.objects.annotate(upper_title=Upper('title'), distance=TrigramWordDistance(text, Upper('title')))
+        .filter(upper_title__trigram_word_similar=text)
+        .order_by('distance')
+        .values('id', 'title', 'price')[:limit]
+    )
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true), "
+                    "set_config('statement_timeout', %s, true)",
+                    [str(settings.ADS_AUTOCOMPLETE_SIMILARITY), str(settings.ADS_AUTOCOMPLETE_FUZZY_TIMEOUT_MS)]
+                )
+            return list(nearest)
+    except OperationalError as exc:
+        if not isinstance(exc.__cause__, QueryCanceled):
+            raise
+        logger.warning('Поиск похожих названий для "%s" прерван по таймауту', prefix)
+        return []
+
+
+def suggest_titles(text, limit):
+    """Возвращает до limit объявлений (id, title, price): сначала начинающиеся с text, затем похожие на него"""
+    prefix = normalize_prefix(text)
+    key = (prefix, limit)
+
+    suggestions = suggestions_cache.get(key)
+    if suggestions is None:
+        suggestions = prefix_suggestions(prefix, limit)
+        if len(suggestions) < limit and len(prefix) >= TRIGRAM_MIN_LENGTH:
+            found = {ad['id'] for ad in suggestions}
+            similar = [ad for ad in similar_suggestions(prefix, limit) if ad['id'] not in found]
+            suggestions += similar[:limit - len(suggestions)]
+        suggestions_cache.set(key, suggestions)
+
+    return suggestions
@@ -1,10 +1,37 @@
+import csv
+import json
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
-
-from ads.models import Ad, Review
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ads import urls as ads_urls
+from ads.benchmark import SCENARIOS
+from ads.cache import ads_list_cache
+from ads.models import Ad, Review, SlowQuery
+from ads.query_plans import IndexedQueriesTestMixin
+from ads.slow_queries import logger as slow_query_logger, plan_node_types
+from ads.suggestions import suggestions_cache
+from ads.views import AdRetrieveAPIView
+from config.metrics import MetricsRegistry, registry as metrics_registry
+from config.query_budget import QueryBudget, QueryBudgetExceeded, QueryBudgetTestMixin
+from users import urls as users_urls
 from users.models import User
+from users.serializers import UserTokenObtainPairSerializer
 
 
 class UnauthorizedUserTestCase(APITestCase):
@@ -641,3 +668,1824 @@ class AdminTestCase(APITestCase):
             Review.objects.all().count(),
             0
         )
+
+
+class AdFeedTestCase(APITestCase):
+    """Класс для тестирования keyset-пагинации ленты объявлений"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.ads = [
+            Ad.objects.create(title=f'ad {number}', price=100 * number, author=self.user) for number in range(10)
+        ]
+        Ad.objects.filter(pk__in=[ad.pk for ad in self.ads[:5]]).update(created_at=self.ads[0].created_at)
+
+    def test_ad_feed_walks_all_pages(self):
+        url = reverse('ads:ads_feed')
+        titles = []
+
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_200_OK
+            )
+            data = response.json()
+            titles.extend(ad['title'] for ad in data['results'])
+            url = data['next']
+
+        expected = Ad.objects.order_by('-created_at', '-id').values_list('title', flat=True)
+        self.assertEqual(
+            titles,
+            list(expected)
+        )
+
+    def test_ad_feed_previous_page(self):
+        url = reverse('ads:ads_feed')
+        first_page = self.client.get(url).json()
+        second_page = self.client.get(first_page['next']).json()
+
+        response = self.client.get(second_page['previous'])
+
+        self.assertEqual(
+            response.json()['results'],
+            first_page['results']
+        )
+
+    def test_ad_feed_is_stable_on_insert(self):
+        url = reverse('ads:ads_feed')
+        first_page = self.client.get(url).json()
+        Ad.objects.create(title='new ad', price=1, author=self.user)
+
+        second_page = self.client.get(first_page['next']).json()
+
+        self.assertNotIn(
+            first_page['results'][-1]['id'],
+            [ad['id'] for ad in second_page['results']]
+        )
+        self.assertNotIn(
+            'new ad',
+            [ad['title'] for ad in second_page['results']]
+        )
+
+    def test_ad_feed_invalid_cursor(self):
+        url = reverse('ads:ads_feed')
+        response = self.client.get(url, {'cursor': 'broken'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+
+
+class AdFilterTestCase(APITestCase):
+    """Класс для тестирования фильтров и сортировок списка объявлений"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.other_user = User.objects.create(email='other@gmail.ru')
+        Ad.objects.create(title='phone', price=10000, author=self.user)
+        Ad.objects.create(title='car', price=500000, author=self.other_user)
+        Ad.objects.create(title='bike', price=20000, author=self.user)
+
+    def test_price_range_with_price_ordering(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url, {'price_min': 5000, 'price_max': 100000, 'ordering': '-price'})
+        data = response.json()
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            [ad['title'] for ad in data['results']],
+            ['bike', 'phone']
+        )
+
+    def test_author_with_default_ordering(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url, {'author': self.user.pk})
+        data = response.json()
+
+        self.assertEqual(
+            [ad['title'] for ad in data['results']],
+            ['bike', 'phone']
+        )
+
+    def test_created_range(self):
+        url = reverse('ads:ads_list')
+        created_at = Ad.objects.get(title='car').created_at
+        response = self.client.get(url, {'created_after': created_at.isoformat()})
+        data = response.json()
+
+        self.assertEqual(
+            [ad['title'] for ad in data['results']],
+            ['bike', 'car']
+        )
+
+    def test_price_range_with_newest_ordering_rejected(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url, {'price_min': 5000})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_two_equality_filters_rejected(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url, {'author': self.user.pk, 'title': 'phone'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_unknown_ordering_rejected(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url, {'ordering': 'description'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_feed_rejects_price_ordering(self):
+        url = reverse('ads:ads_feed')
+        response = self.client.get(url, {'ordering': 'price'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class AdSearchTestCase(APITestCase):
+    """Класс для тестирования полнотекстового поиска по объявлениям"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        Ad.objects.create(title='Велосипед горный', price=20000, description='почти новый', author=self.user)
+        Ad.objects.create(title='Шлем', price=3000, description='подойдет для велосипеда', author=self.user)
+        Ad.objects.create(title='Телефон', price=10000, description='4 камеры', author=self.user)
+
+    def test_search_ranks_title_above_description(self):
+        url = reverse('ads:ads_search')
+        response = self.client.get(url, {'q': 'велосипеды'})
+        data = response.json()
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            [ad['title'] for ad in data['results']],
+            ['Велосипед горный', 'Шлем']
+        )
+        self.assertNotIn(
+            'search_vector',
+            data['results'][0]
+        )
+
+    def test_search_vector_follows_update(self):
+        ad = Ad.objects.get(title='Телефон')
+        ad.description = 'отдам вместе с велосипедом'
+        ad.save()
+
+        url = reverse('ads:ads_search')
+        response = self.client.get(url, {'q': 'велосипед'})
+
+        self.assertEqual(
+            response.json()['count'],
+            3
+        )
+
+    def test_search_without_query(self):
+        url = reverse('ads:ads_search')
+        response = self.client.get(url)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class AdAutocompleteTestCase(APITestCase):
+    """Класс для тестирования автодополнения названий объявлений"""
+
+    def setUp(self):
+        self.client = APIClient()
+        suggestions_cache.clear()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        Ad.objects.create(title='Телефон Samsung', price=10000, description='4 камеры', author=self.user)
+        Ad.objects.create(title='Телевизор', price=30000, author=self.user)
+        Ad.objects.create(title='Велосипед', price=20000, author=self.user)
+
+    def test_autocomplete_prefix(self):
+        url = reverse('ads:ads_autocomplete')
+        response = self.client.get(url, {'q': 'те'})
+        data = response.json()
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            sorted(ad['title'] for ad in data),
+            ['Телевизор', 'Телефон Samsung']
+        )
+        self.assertEqual(
+            set(data[0]),
+            {'id', 'title', 'price'}
+        )
+
+    def test_autocomplete_misspelled(self):
+        url = reverse('ads:ads_autocomplete')
+        response = self.client.get(url, {'q': 'велосепед'})
+        data = response.json()
+
+        self.assertEqual(
+            [ad['title'] for ad in data],
+            ['Велосипед']
+        )
+
+    def test_autocomplete_prefix_before_similar(self):
+        Ad.objects.create(title='Велосипедный шлем', price=3000, author=self.user)
+        Ad.objects.create(title='Веласипед детский', price=5000, author=self.user)
+        url = reverse('ads:ads_autocomplete')
+        response = self.client.get(url, {'q': 'велосипед'})
+
+        self.assertEqual(
+            [ad['title'] for ad in response.json()],
+            ['Велосипед', 'Велосипедный шлем', 'Веласипед детский']
+        )
+
+    @override_settings(QUERY_BUDGET_MODE='off')
+    def test_autocomplete_similar_timeout(self):
+        Ad.objects.create(title='Велосипедный шлем', price=3000, author=self.user)
+        Ad.objects.create(title='Веласипед детский', price=5000, author=self.user)
+        url = reverse('ads:ads_autocomplete')
+
+        def slow_similar_query(execute, sql, params, many, context):
+            if '<<->' in sql:
+                execute('SELECT pg_sleep(1)', None, many, context)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(slow_similar_query), self.assertLogs('ads.suggestions', 'WARNING'):
+            response = self.client.get(url, {'q': 'велосипед'})
+
+        self.assertEqual(
+            [ad['title'] for ad in response.json()],
+            ['Велосипед', 'Велосипедный шлем']
+        )
+
+    def test_autocomplete_limit(self):
+        url = reverse('ads:ads_autocomplete')
+        response = self.client.get(url, {'q': 'те', 'limit': 1})
+
+        self.assertEqual(
+            len(response.json()),
+            1
+        )
+
+    def test_autocomplete_hot_prefix_is_cached(self):
+        url = reverse('ads:ads_autocomplete')
+        self.client.get(url, {'q': 'Теле'})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'q': ' теле '})
+
+        self.assertEqual(
+            len(response.json()),
+            2
+        )
+
+    def test_autocomplete_without_query(self):
+        url = reverse('ads:ads_autocomplete')
+        response = self.client.get(url)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class AdListCacheTestCase(APITestCase):
+    """Класс для тестирования кэша списка объявлений для анонимных пользователей"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.ad = Ad.objects.create(title='phone', price=10000, author=self.user)
+
+    def test_anonymous_page_is_cached(self):
+        url = reverse('ads:ads_list')
+        self.client.get(url, {'page': 1, 'page_size': 4})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'page_size': 4, 'page': 1})
+
+        self.assertEqual(
+            response.json()['results'][0]['title'],
+            'phone'
+        )
+        self.assertEqual(
+            ads_list_cache.get_stats()['hits'],
+            1
+        )
+
+    def test_write_invalidates_cached_pages(self):
+        url = reverse('ads:ads_list')
+        self.client.get(url)
+
+        self.ad.title = 'car'
+        self.ad.save()
+        response = self.client.get(url)
+
+        self.assertEqual(
+            response.json()['results'][0]['title'],
+            'car'
+        )
+
+        self.ad.delete()
+        response = self.client.get(url)
+
+        self.assertEqual(
+            response.json()['count'],
+            0
+        )
+        self.assertEqual(
+            ads_list_cache.get_stats()['misses'],
+            3
+        )
+
+    def test_authenticated_user_bypasses_cache(self):
+        url = reverse('ads:ads_list')
+        self.client.force_authenticate(user=self.user)
+        self.client.get(url)
+        self.client.get(url)
+
+        self.assertEqual(
+            ads_list_cache.get_stats(),
+            {'version': ads_list_cache.get_version(), 'hits': 0, 'misses': 0}
+        )
+
+
+class ConditionalGetTestCase(APITestCase):
+    """Класс для тестирования условных GET-запросов к объявлениям и отзывам"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.ad = Ad.objects.create(title='phone', price=10000, description='4 cameras', author=self.user)
+        self.review = Review.objects.create(ad=self.ad, author=self.user, text='good for this price')
+
+        self.client.force_authenticate(user=self.user)
+
+    def test_ad_retrieve_if_none_match(self):
+        url = reverse('ads:ads_retrieve', args=(self.ad.pk,))
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(
+            response['ETag'],
+            etag
+        )
+
+    def test_ad_retrieve_if_modified_since(self):
+        url = reverse('ads:ads_retrieve', args=(self.ad.pk,))
+        last_modified = self.client.get(url)['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_ad_retrieve_after_update(self):
+        url = reverse('ads:ads_retrieve', args=(self.ad.pk,))
+        etag = self.client.get(url)['ETag']
+        self.ad.price = 20000
+        self.ad.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            response.json()['price'],
+            20000
+        )
+
+    def test_review_retrieve_if_none_match(self):
+        url = reverse('ads:reviews_retrieve', args=(self.review.pk,))
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_review_retrieve_still_checks_permissions(self):
+        url = reverse('ads:reviews_retrieve', args=(self.review.pk,))
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(user=User.objects.create(email='alien@gmail.ru'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+
+    def test_ad_list_if_none_match(self):
+        url = reverse('ads:ads_list')
+        etag = self.client.get(url, {'page': 1})['ETag']
+
+        response = self.client.get(url, {'page': 1}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_ad_list_after_delete(self):
+        url = reverse('ads:ads_list')
+        Ad.objects.create(title='car', price=500000, author=self.user)
+        etag = self.client.get(url)['ETag']
+        Ad.objects.get(title='car').delete()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_ad_list_etag_depends_on_page(self):
+        url = reverse('ads:ads_list')
+        newer_ad = Ad.objects.create(title='car', price=500000, author=self.user)
+        etag = self.client.get(url, {'page_size': 1})['ETag']
+
+        self.ad.price = 20000
+        self.ad.save()
+        response = self.client.get(url, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag)
+        newer_ad.price = 400000
+        newer_ad.save()
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(
+            self.client.get(url, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_anonymous_ad_list_if_none_match(self):
+        url = reverse('ads:ads_list')
+        self.client.force_authenticate(user=None)
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_ad_feed_if_none_match(self):
+        url = reverse('ads:ads_feed')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.ad.price = 20000
+        self.ad.save()
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_review_list_if_none_match(self):
+        url = reverse('ads:reviews_list')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+
+class ReviewAggregatesTestCase(APITestCase):
+    """Класс для тестирования счетчика отзывов и даты последнего отзыва у объявления"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.ad = Ad.objects.create(title='phone', price=10000, author=self.user)
+        self.other_ad = Ad.objects.create(title='car', price=500000, author=self.user)
+
+        self.client.force_authenticate(user=self.user)
+
+    def test_review_create_updates_ad(self):
+        url = reverse('ads:reviews_create')
+        self.client.post(url, {'text': 'first', 'ad': self.ad.pk})
+        self.client.post(url, {'text': 'second', 'ad': self.ad.pk})
+
+        self.ad.refresh_from_db()
+        self.assertEqual(
+            self.ad.review_count,
+            2
+        )
+        self.assertEqual(
+            self.ad.last_review_at,
+            Review.objects.get(text='second').created_at
+        )
+
+    def test_review_delete_updates_ad(self):
+        first = Review.objects.create(ad=self.ad, author=self.user, text='first')
+        second = Review.objects.create(ad=self.ad, author=self.user, text='second')
+        call_command('recompute_review_aggregates', stdout=StringIO())
+
+        self.client.delete(reverse('ads:reviews_delete', args=(second.pk,)))
+
+        self.ad.refresh_from_db()
+        self.assertEqual(
+            self.ad.review_count,
+            1
+        )
+        self.assertEqual(
+            self.ad.last_review_at,
+            first.created_at
+        )
+
+    def test_review_move_updates_both_ads(self):
+        review = Review.objects.create(ad=self.ad, author=self.user, text='first')
+        call_command('recompute_review_aggregates', stdout=StringIO())
+
+        self.client.patch(reverse('ads:reviews_update', args=(review.pk,)), {'ad': self.other_ad.pk})
+
+        self.assertEqual(
+            list(Ad.objects.order_by('pk').values_list('review_count', flat=True)),
+            [0, 1]
+        )
+
+    def test_review_count_is_read_only(self):
+        url = reverse('ads:ads_update', args=(self.ad.pk,))
+        response = self.client.patch(url, {'review_count': 100})
+
+        self.assertEqual(
+            response.json()['review_count'],
+            0
+        )
+
+    def test_recompute_command_repairs_drift(self):
+        Review.objects.create(ad=self.other_ad, author=self.user, text='first')
+        Ad.objects.filter(pk=self.ad.pk).update(review_count=5)
+        out = StringIO()
+
+        call_command('recompute_review_aggregates', batch_size=1, stdout=out)
+
+        self.assertEqual(
+            list(Ad.objects.order_by('pk').values_list('review_count', flat=True)),
+            [0, 1]
+        )
+        self.assertIn(
+            'исправлено объявлений: 2',
+            out.getvalue()
+        )
+
+    def test_ad_list_ordered_by_review_activity(self):
+        Review.objects.create(ad=self.ad, author=self.user, text='first')
+        call_command('recompute_review_aggregates', stdout=StringIO())
+
+        response = self.client.get(reverse('ads:ads_list'), {'ordering': '-last_review_at'})
+
+        self.assertEqual(
+            [ad['title'] for ad in response.json()['results']],
+            ['phone', 'car']
+        )
+
+
+class AdExpandAuthorTestCase(APITestCase):
+    """Класс для тестирования встраивания автора в ответы с объявлениями"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        self.user = User.objects.create(email='test@gmail.ru', first_name='danil')
+        self.ad = Ad.objects.create(title='phone', price=10000, author=self.user)
+
+        self.client.force_authenticate(user=self.user)
+
+    @staticmethod
+    def create_ads(start, stop):
+        for number in range(start, stop):
+            author = User.objects.create(email=f'author{number}@gmail.ru', first_name=f'author {number}')
+            Ad.objects.create(title=f'ad {number}', price=number, author=author)
+
+    def test_ad_list_expand_author(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url, {'expand': 'author'})
+
+        self.assertEqual(
+            response.json()['results'][0]['author'],
+            {'id': self.user.pk, 'first_name': 'danil', 'image': None}
+        )
+
+    def test_ad_list_without_expand(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url)
+
+        self.assertEqual(
+            response.json()['results'][0]['author'],
+            self.user.pk
+        )
+
+    def test_ad_retrieve_expand_author(self):
+        url = reverse('ads:ads_retrieve', args=(self.ad.pk,))
+        response = self.client.get(url, {'expand': 'author'})
+
+        self.assertEqual(
+            response.json()['author']['first_name'],
+            'danil'
+        )
+
+    def test_ad_list_expand_query_count_is_constant(self):
+        url = reverse('ads:ads_list')
+        self.create_ads(0, 4)
+        with self.assertNumQueries(2):
+            self.client.get(url, {'expand': 'author', 'page_size': 20})
+
+        self.create_ads(4, 19)
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'expand': 'author', 'page_size': 20})
+
+        self.assertEqual(
+            len(response.json()['results']),
+            20
+        )
+
+    def test_unknown_expand(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url, {'expand': 'reviews'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class SparseFieldsetTestCase(APITestCase):
+    """Класс для тестирования выборки отдельных полей объявлений и отзывов"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.ad = Ad.objects.create(title='phone', price=10000, description='4 cameras ' * 100, author=self.user)
+        self.review = Review.objects.create(ad=self.ad, author=self.user, text='good for this price')
+
+        self.client.force_authenticate(user=self.user)
+
+    def test_ad_list_returns_description_excerpt(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url)
+        data = response.json()['results'][0]
+
+        self.assertNotIn(
+            'description',
+            data
+        )
+        self.assertEqual(
+            data['description_excerpt'],
+            self.ad.description[:settings.ADS_DESCRIPTION_EXCERPT_LENGTH]
+        )
+
+    def test_ad_list_fields(self):
+        url = reverse('ads:ads_list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,title,price'})
+
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': self.ad.pk, 'title': 'phone', 'price': 10000}]
+        )
+        self.assertNotIn(
+            'description',
+            queries.captured_queries[-1]['sql']
+        )
+
+    def test_ad_retrieve_fields(self):
+        url = reverse('ads:ads_retrieve', args=(self.ad.pk,))
+        response = self.client.get(url, {'fields': 'title,description'})
+
+        self.assertEqual(
+            response.json(),
+            {'title': 'phone', 'description': self.ad.description}
+        )
+
+    def test_ad_feed_fields(self):
+        Ad.objects.create(title='car', price=500000, author=self.user)
+        url = reverse('ads:ads_feed')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'title', 'page_size': 1})
+
+        self.assertEqual(
+            self.client.get(response.json()['next']).json()['results'],
+            [{'title': 'phone'}]
+        )
+
+    def test_review_list_fields(self):
+        url = reverse('ads:reviews_list')
+        response = self.client.get(url, {'fields': 'id,ad'})
+
+        self.assertEqual(
+            response.json(),
+            [{'id': self.review.pk, 'ad': self.ad.pk}]
+        )
+
+    def test_unknown_field(self):
+        url = reverse('ads:ads_list')
+        response = self.client.get(url, {'fields': 'title,password'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class AdCreateTestCase(APITestCase):
+    """Класс для тестирования одиночного и пакетного создания объявлений"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+
+        self.client.force_authenticate(user=self.user)
+
+    def test_ad_create_single_insert(self):
+        url = reverse('ads:ads_create')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'title': 'car', 'price': 500000})
+
+        self.assertEqual(
+            response.json()['author'],
+            self.user.pk
+        )
+        self.assertEqual(
+            [query['sql'].split()[0] for query in queries.captured_queries],
+            ['INSERT']
+        )
+
+    def test_ad_bulk_create(self):
+        url = reverse('ads:ads_bulk_create')
+        obj = [{'title': f'ad {number}', 'price': number} for number in range(30)]
+
+        with self.settings(ADS_BULK_CREATE_BATCH_SIZE=10), CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, obj, format='json')
+        data = response.json()
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_201_CREATED
+        )
+        self.assertEqual(
+            len(data['created']),
+            30
+        )
+        self.assertEqual(
+            Ad.objects.filter(author=self.user).count(),
+            30
+        )
+        self.assertEqual(
+            len([query for query in queries.captured_queries if query['sql'].startswith('INSERT')]),
+            3
+        )
+
+    def test_ad_bulk_create_partial_errors(self):
+        url = reverse('ads:ads_bulk_create')
+        obj = [
+            {'title': 'car', 'price': 500000},
+            {'title': 'phone', 'price': -1},
+            {'price': 100},
+            {'title': 'bike', 'price': 20000, 'author': 999},
+        ]
+        response = self.client.post(url, obj, format='json')
+        data = response.json()
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_201_CREATED
+        )
+        self.assertEqual(
+            [(ad['index'], ad['title'], ad['author']) for ad in data['created']],
+            [(0, 'car', self.user.pk), (3, 'bike', self.user.pk)]
+        )
+        self.assertEqual(
+            [error['index'] for error in data['errors']],
+            [1, 2]
+        )
+
+    def test_ad_bulk_create_all_invalid(self):
+        url = reverse('ads:ads_bulk_create')
+        response = self.client.post(url, [{'title': 'car'}], format='json')
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            Ad.objects.count(),
+            0
+        )
+
+    def test_ad_bulk_create_not_a_list(self):
+        url = reverse('ads:ads_bulk_create')
+        response = self.client.post(url, {'title': 'car', 'price': 1}, format='json')
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_ad_bulk_create_unauthorized(self):
+        url = reverse('ads:ads_bulk_create')
+        self.client.force_authenticate(user=None)
+        response = self.client.post(url, [{'title': 'car', 'price': 1}], format='json')
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_401_UNAUTHORIZED
+        )
+
+
+class ExportTestCase(APITestCase):
+    """Класс для тестирования потоковой выгрузки объявлений и отзывов"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.user_admin = User.objects.create(email='admin@yandex.ru')
+        Group.objects.create(name='Администраторы').user_set.add(self.user_admin)
+
+        self.ads = [Ad.objects.create(title=f'ad, {number}', price=number, author=self.user) for number in range(5)]
+        Review.objects.create(ad=self.ads[0], author=self.user, text='good\nfor this price')
+
+        self.client.force_authenticate(user=self.user_admin)
+
+    def test_ads_export_ndjson(self):
+        url = reverse('ads:ads_export')
+        response = self.client.get(url)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+        self.assertEqual(
+            response['Content-Type'],
+            'application/x-ndjson; charset=utf-8'
+        )
+        self.assertEqual(
+            [row['title'] for row in rows],
+            [ad.title for ad in self.ads]
+        )
+
+    def test_ads_export_csv_resume(self):
+        url = reverse('ads:ads_export')
+        response = self.client.get(url, {'file_type': 'csv', 'after_id': self.ads[2].pk})
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(
+            [(int(row[0]), row[1]) for row in rows],
+            [(ad.pk, ad.title) for ad in self.ads[3:]]
+        )
+
+    def test_reviews_export_csv(self):
+        url = reverse('ads:reviews_export')
+        response = self.client.get(url, {'file_type': 'csv'})
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(
+            rows[0]['text'],
+            'good\nfor this price'
+        )
+
+    def test_export_forbidden_for_user(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('ads:ads_export'))
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+
+    def test_export_unknown_format(self):
+        response = self.client.get(reverse('ads:ads_export'), {'file_type': 'xml'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_data', 'ads', '--format', 'ndjson', '--after-id', str(self.ads[3].pk), stdout=out)
+
+        self.assertEqual(
+            [json.loads(line)['id'] for line in out.getvalue().splitlines()],
+            [self.ads[4].pk]
+        )
+
+
+class ImportAdsTestCase(APITestCase):
+    """Класс для тестирования загрузки объявлений и отзывов командой import_ads"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = Path(self.directory.name) / name
+        path.write_text(content, encoding='utf-8')
+        return str(path)
+
+    def test_import_ads_csv(self):
+        path = self.write('ads.csv', (
+            'title,price,description,author_email,created_at\n'
+            'phone,10000,"4 cameras, 128 GB",test@gmail.ru,2024-01-01T10:00:00+00:00\n'
+            'car,-5,,test@gmail.ru,\n'
+            'bike,20000,,unknown@gmail.ru,\n'
+            ',100,,,\n'
+            'lamp,300,,,\n'
+        ))
+        out, err = StringIO(), StringIO()
+
+        call_command('import_ads', path, batch_size=2, stdout=out, stderr=err)
+
+        self.assertEqual(
+            list(Ad.objects.order_by('title').values_list('title', 'description', 'author__email')),
+            [('lamp', None, None), ('phone', '4 cameras, 128 GB', 'test@gmail.ru')]
+        )
+        self.assertIn(
+            'загружено 2, отклонено 3',
+            out.getvalue()
+        )
+        self.assertIn(
+            'строка 2: price',
+            err.getvalue()
+        )
+
+    def test_import_reviews_jsonl(self):
+        ad = Ad.objects.create(title='phone', price=10000, author=self.user)
+        path = self.write('reviews.jsonl', '\n'.join((
+            json.dumps({'ad_id': ad.pk, 'text': 'good', 'author_email': 'test@gmail.ru'}),
+            json.dumps({'ad_id': ad.pk + 100, 'text': 'bad'}),
+            'not json',
+            json.dumps({'ad_id': ad.pk, 'text': 'nice', 'created_at': '2024-01-01T10:00:00'}),
+        )))
+
+        call_command('import_ads', path, model='reviews', stdout=StringIO(), stderr=StringIO())
+
+        ad.refresh_from_db()
+        self.assertEqual(
+            sorted(Review.objects.values_list('text', flat=True)),
+            ['good', 'nice']
+        )
+        self.assertEqual(
+            ad.review_count,
+            2
+        )
+
+    def test_import_reviews_recomputes_only_their_ads(self):
+        ad = Ad.objects.create(title='phone', price=10000, author=self.user)
+        # расхождение у другого объявления исправляет только полный пересчет recompute_review_aggregates
+        other_ad = Ad.objects.create(title='car', price=500000, author=self.user, review_count=5)
+        path = self.write('reviews.jsonl', json.dumps({'ad_id': ad.pk, 'text': 'good'}))
+
+        out = StringIO()
+        call_command('import_ads', path, model='reviews', stdout=out, stderr=StringIO())
+
+        self.assertEqual(
+            list(Ad.objects.filter(pk__in=(ad.pk, other_ad.pk)).order_by('pk').values_list('review_count', flat=True)),
+            [1, 5]
+        )
+        self.assertIn(
+            'пересчитаны агрегаты отзывов у 1 объявлений',
+            out.getvalue()
+        )
+
+
+class SeedTestCase(APITestCase):
+    """Класс для тестирования генерации синтетических данных командой seed"""
+
+    def seed(self, **options):
+        call_command('seed', '--until=2024-06-01T00:00:00+00:00', users=5, ads=40, reviews=100, clear=True,
+                     stdout=StringIO(), **options)
+        return list(Ad.objects.filter(author__email__endswith='@seed.example').order_by('pk')
+                    .values_list('title', 'price', 'created_at', 'author__email', 'review_count'))
+
+    def test_seed(self):
+        Ad.objects.create(title='phone', price=10000)
+
+        ads = self.seed()
+
+        self.assertEqual(
+            (User.objects.count(), Ad.objects.count(), Review.objects.count()),
+            (5, 41, 100)
+        )
+        self.assertEqual(
+            sum(ad[4] for ad in ads),
+            100
+        )
+        self.assertEqual(
+            ads,
+            sorted(ads, key=lambda ad: ad[2])
+        )
+
+    def test_seed_is_deterministic(self):
+        self.assertEqual(
+            self.seed(),
+            self.seed()
+        )
+        self.assertNotEqual(
+            self.seed(),
+            self.seed(seed=1)
+        )
+
+    def test_clear_keeps_real_data(self):
+        user = User.objects.create(email='test@gmail.ru')
+        ad = Ad.objects.create(title='phone', price=10000, author=user)
+        Review.objects.create(ad=ad, author=user, text='good')
+        self.seed()
+        Review.objects.create(ad=ad, author=User.objects.filter(email__endswith='@seed.example').first(), text='bad')
+        Ad.objects.filter(pk=ad.pk).update(review_count=2)
+
+        self.seed()
+
+        ad.refresh_from_db()
+        self.assertEqual(
+            list(Review.objects.filter(ad=ad).values_list('text', flat=True)),
+            ['good']
+        )
+        self.assertEqual(
+            (ad.review_count, User.objects.count(), Ad.objects.count()),
+            (1, 6, 41)
+        )
+
+    def test_seed_keeps_constraints_with_other_data(self):
+        out = StringIO()
+        call_command('seed', users=5, ads=40, reviews=100, stdout=out)
+        self.assertNotIn(
+            'индексы и внешние ключи не снимаются',
+            out.getvalue()
+        )
+
+        Ad.objects.create(title='phone', price=10000)
+        out = StringIO()
+        call_command('seed', users=5, ads=40, reviews=100, clear=True, stdout=out)
+
+        self.assertIn(
+            'индексы и внешние ключи не снимаются',
+            out.getvalue()
+        )
+
+    def test_seeded_users_cannot_login(self):
+        self.seed()
+        response = self.client.post(reverse('users:login'), {'email': 'user0@seed.example', 'password': 'password'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertFalse(User.objects.get(email='user0@seed.example').has_usable_password())
+
+    def test_seeded_users_password(self):
+        self.seed(password='secret')
+        response = self.client.post(reverse('users:login'), {'email': 'user0@seed.example', 'password': 'secret'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_seed_requires_clear(self):
+        self.seed()
+
+        with self.assertRaises(CommandError):
+            call_command('seed', users=5, ads=40, reviews=100, stdout=StringIO())
+
+
+class BenchmarkTestCase(APITestCase):
+    """Класс для тестирования замеров производительности командой benchmark"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.output = str(Path(self.directory.name) / 'benchmark.json')
+
+    def run_benchmark(self, *args):
+        call_command('benchmark', *args, requests=2, warmup=0, output=self.output, stdout=StringIO(),
+                     stderr=StringIO())
+        return json.loads(Path(self.output).read_text(encoding='utf-8'))
+
+    def test_scenarios_cover_all_routes(self):
+        url_names = {f'{app}:{pattern.name}' for app, urls in (('ads', ads_urls), ('users', users_urls))
+                     for pattern in urls.urlpatterns}
+
+        self.assertEqual(
+            {scenario.url_name for scenario in SCENARIOS},
+            url_names
+        )
+
+    def test_benchmark(self):
+        report = self.run_benchmark()
+
+        self.assertEqual(
+            set(report['results']),
+            {scenario.name for scenario in SCENARIOS}
+        )
+        self.assertEqual(
+            [name for name, result in report['results'].items() if result['errors']],
+            []
+        )
+        self.assertEqual(
+            report['results']['ads_feed:user']['requests'],
+            2
+        )
+        self.assertEqual(
+            (User.objects.count(), Ad.objects.count()),
+            (0, 0)
+        )
+
+    def test_benchmark_does_not_leave_cached_pages(self):
+        self.run_benchmark('--only', 'ads_list:anonymous')
+
+        self.assertEqual(
+            self.client.get(reverse('ads:ads_list')).json()['results'],
+            []
+        )
+
+    def test_dataset_refuses_real_data(self):
+        Ad.objects.create(title='phone', price=10000)
+
+        with self.assertRaises(CommandError):
+            self.run_benchmark('--dataset', 'small')
+
+        self.assertEqual(
+            list(Ad.objects.values_list('title', flat=True)),
+            ['phone']
+        )
+
+    def test_registration_throughput(self):
+        report = self.run_benchmark('--only', 'ads_feed:anonymous', '--registration-workers', '2',
+                                    '--registration-requests', '2')
+
+        self.assertEqual(
+            {name: report['registration'][name] for name in ('workers', 'requests', 'errors')},
+            {'workers': 2, 'requests': 4, 'errors': 0}
+        )
+        self.assertGreater(
+            report['registration']['throughput_per_worker_rps'],
+            0
+        )
+        self.assertEqual(
+            User.objects.count(),
+            0
+        )
+
+    def test_compare(self):
+        baseline = self.run_benchmark('--only', 'ads_feed:anonymous')
+        baseline_path = str(Path(self.directory.name) / 'baseline.json')
+
+        baseline['results']['ads_feed:anonymous']['p95_ms'] = 1000000
+        Path(baseline_path).write_text(json.dumps(baseline), encoding='utf-8')
+        self.run_benchmark('--only', 'ads_feed:anonymous', '--compare', baseline_path)
+
+        baseline['results']['ads_feed:anonymous']['p95_ms'] = 0
+        Path(baseline_path).write_text(json.dumps(baseline), encoding='utf-8')
+        with self.assertRaises(CommandError):
+            self.run_benchmark('--only', 'ads_feed:anonymous', '--compare', baseline_path)
+
+
+@override_settings(QUERY_BUDGET_MODE='log')
+class AdQueryBudgetTestCase(QueryBudgetTestMixin, APITestCase):
+    """Класс для проверки бюджетов SQL-запросов view приложения ads с авторизацией по JWT"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.admin = User.objects.create(email='admin@gmail.ru')
+        self.admin.groups.add(Group.objects.create(name='Администраторы'))
+        self.ad = Ad.objects.create(title='phone', price=10000, description='4 cameras', author=self.user)
+        self.other_ad = Ad.objects.create(title='car', price=500000, author=self.user)
+        self.review = Review.objects.create(ad=self.ad, author=self.user, text='good for this price')
+
+    def login(self, user, claims=True):
+        token = UserTokenObtainPairSerializer.get_token(user).access_token if claims else AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_public_lists(self):
+        requests = (
+            (reverse('ads:ads_list'), {}),
+            (reverse('ads:ads_list'), {'ordering': 'price', 'expand': 'author'}),
+            (reverse('ads:ads_feed'), {}),
+            (reverse('ads:ads_search'), {'q': 'phone'}),
+            (reverse('ads:ads_autocomplete'), {'q': 'pho'}),
+        )
+        for user in (None, self.user):
+            if user:
+                self.login(user)
+            for url, params in requests:
+                with self.subTest(url=url, params=params, user=user):
+                    self.assertWithinQueryBudget(self.client.get(url, params))
+
+    def test_ads_write(self):
+        self.login(self.user)
+        self.assertWithinQueryBudget(
+            self.client.post(reverse('ads:ads_create'), {'title': 'bike', 'price': 100})
+        )
+        self.assertWithinQueryBudget(
+            self.client.post(reverse('ads:ads_bulk_create'), [{'title': 'bike', 'price': 100}] * 10, format='json')
+        )
+
+        self.login(self.admin)
+        self.assertWithinQueryBudget(
+            self.client.get(reverse('ads:ads_retrieve', args=[self.ad.pk]))
+        )
+        self.assertWithinQueryBudget(
+            self.client.patch(reverse('ads:ads_update', args=[self.ad.pk]), {'price': 9000})
+        )
+        self.assertWithinQueryBudget(
+            self.client.delete(reverse('ads:ads_delete', args=[self.ad.pk]))
+        )
+
+    def test_reviews(self):
+        self.login(self.user)
+        self.assertWithinQueryBudget(
+            self.client.get(reverse('ads:reviews_list'))
+        )
+        self.assertWithinQueryBudget(
+            self.client.post(reverse('ads:reviews_create'), {'text': 'nice', 'ad': self.ad.pk})
+        )
+
+        self.login(self.admin)
+        self.assertWithinQueryBudget(
+            self.client.get(reverse('ads:reviews_retrieve', args=[self.review.pk]))
+        )
+        self.assertWithinQueryBudget(
+            self.client.patch(reverse('ads:reviews_update', args=[self.review.pk]), {'ad': self.other_ad.pk})
+        )
+        self.assertWithinQueryBudget(
+            self.client.delete(reverse('ads:reviews_delete', args=[self.review.pk]))
+        )
+
+    def test_admin_token_without_claims(self):
+        self.login(self.admin, claims=False)
+        requests = (
+            ('get', reverse('ads:reviews_retrieve', args=[self.review.pk]), {}),
+            ('patch', reverse('ads:reviews_update', args=[self.review.pk]), {'ad': self.other_ad.pk}),
+            ('delete', reverse('ads:reviews_delete', args=[self.review.pk]), {}),
+            ('patch', reverse('ads:ads_update', args=[self.ad.pk]), {'price': 9000}),
+            ('delete', reverse('ads:ads_delete', args=[self.ad.pk]), {}),
+            ('get', reverse('ads:ads_export'), {'file_type': 'csv'}),
+        )
+        for method, url, data in requests:
+            with self.subTest(method=method, url=url):
+                self.assertWithinQueryBudget(getattr(self.client, method)(url, data))
+
+    def test_export(self):
+        self.login(self.admin)
+        for name in ('ads:ads_export', 'ads:reviews_export'):
+            with self.subTest(name=name):
+                self.assertWithinQueryBudget(self.client.get(reverse(name), {'file_type': 'csv'}))
+
+    def test_budget_violation(self):
+        self.login(self.user)
+
+        with override_settings(QUERY_BUDGET_MODE='raise'), self.assertRaises(QueryBudgetExceeded):
+            with mock.patch.object(AdRetrieveAPIView, 'query_budget', QueryBudget(queries=1)):
+                self.client.get(reverse('ads:ads_retrieve', args=[self.ad.pk]))
+
+        with override_settings(QUERY_BUDGET_MODE='log'), self.assertLogs('config.query_budget', 'WARNING') as logs:
+            with mock.patch.object(AdRetrieveAPIView, 'query_budget', QueryBudget(queries=1)):
+                response = self.client.get(reverse('ads:ads_retrieve', args=[self.ad.pk]))
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertIn(
+            'ads:ads_retrieve: 2 SQL-запросов при бюджете 1',
+            logs.output[0]
+        )
+
+
+class MetricsTestCase(APITestCase):
+    """Класс для тестирования метрик запросов и эндпоинта /metrics"""
+
+    def setUp(self):
+        metrics_registry.clear()
+        self.addCleanup(metrics_registry.clear)
+        self.user = User.objects.create(email='test@gmail.ru')
+        Ad.objects.create(title='phone', price=10000, author=self.user)
+
+    def test_metrics(self):
+        self.client.get(reverse('ads:ads_list'))
+        self.client.get(reverse('ads:ads_list'))
+        self.client.get(reverse('ads:ads_retrieve', args=[1000]))
+
+        response = self.client.get(reverse('metrics'))
+        text = response.content.decode()
+
+        self.assertEqual(
+            response['Content-Type'],
+            'text/plain; version=0.0.4; charset=utf-8'
+        )
+        self.assertIn(
+            'http_requests_total{view="ads:ads_list",method="GET",status="200"} 2',
+            text
+        )
+        self.assertIn(
+            'http_requests_total{view="ads:ads_retrieve",method="GET",status="401"} 1',
+            text
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{view="ads:ads_list",method="GET"} 2',
+            text
+        )
+        self.assertIn(
+            'http_request_db_queries_bucket{view="ads:ads_list",method="GET",le="+Inf"} 2',
+            text
+        )
+        self.assertIn(
+            'http_response_size_bytes_count{view="ads:ads_list",method="GET"} 2',
+            text
+        )
+
+    def test_streaming_response(self):
+        admin = User.objects.create(email='admin@gmail.ru')
+        admin.groups.add(Group.objects.create(name='Администраторы'))
+        self.client.force_authenticate(admin)
+
+        response = self.client.get(reverse('ads:ads_export'))
+        size = len(b''.join(response.streaming_content))
+
+        self.assertIn(
+            f'http_response_size_bytes_sum{{view="ads:ads_export",method="GET"}} {size}',
+            metrics_registry.render()
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(
+            self.client.get(reverse('metrics')).status_code,
+            status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertEqual(
+            self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret').status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_processes_share_directory(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        first = MetricsRegistry(directory.name)
+        second = MetricsRegistry(directory.name)
+        labels = (('view', 'ads:ads_list'), ('method', 'GET'))
+
+        first.inc('http_requests_total', (*labels, ('status', '200')))
+        first.observe('http_request_duration_seconds', labels, 0.2)
+        first.flush()
+        second.inc('http_requests_total', (*labels, ('status', '200')), 2)
+        second.observe('http_request_duration_seconds', labels, 3)
+
+        text = second.render()
+
+        self.assertIn(
+            'http_requests_total{view="ads:ads_list",method="GET",status="200"} 3',
+            text
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="ads:ads_list",method="GET",le="0.25"} 1',
+            text
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="ads:ads_list",method="GET",le="+Inf"} 2',
+            text
+        )
+
+    def test_finished_processes_are_compacted(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        finished = MetricsRegistry(directory.name)
+        finished.filename = f'{process.pid}-finished.json'
+        registry = MetricsRegistry(directory.name)
+        labels = (('view', 'ads:ads_list'), ('method', 'GET'), ('status', '200'))
+
+        finished.inc('http_requests_total', labels)
+        finished.flush()
+        registry.inc('http_requests_total', labels, 2)
+
+        texts = [registry.render(), registry.render()]
+
+        self.assertEqual(
+            [text.count('http_requests_total{view="ads:ads_list",method="GET",status="200"} 3') for text in texts],
+            [1, 1]
+        )
+        self.assertEqual(
+            sorted(path.name for path in Path(directory.name).iterdir()),
+            ['compacted.json', 'metrics.lock']
+        )
+
+
+class ServerTimingTestCase(APITestCase):
+    """Класс для тестирования заголовка Server-Timing с фазами обработки запроса"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.ad = Ad.objects.create(title='phone', price=10000, author=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_server_timing(self):
+        with self.assertLogs('config.server_timing', 'INFO') as logs:
+            response = self.client.get(reverse('ads:ads_retrieve', args=[self.ad.pk]))
+
+        phases = [item.split(';')[0] for item in response['Server-Timing'].split(', ')]
+        record = json.loads(logs.records[0].getMessage())
+
+        self.assertEqual(
+            phases,
+            ['auth', 'permission', 'db', 'serialize', 'render', 'total']
+        )
+        self.assertIn(
+            f'desc="{record["queries"]} queries"',
+            response['Server-Timing']
+        )
+        self.assertEqual(
+            (record['view'], record['status'], sorted(record['timing_ms'])),
+            ('ads:ads_retrieve', 200, sorted(phases))
+        )
+        self.assertGreater(
+            record['timing_ms']['auth'],
+            0
+        )
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_server_timing_disabled(self):
+        response = self.client.get(reverse('ads:ads_retrieve', args=[self.ad.pk]))
+
+        self.assertNotIn(
+            'Server-Timing',
+            response
+        )
+
+
+class ProfilingTestCase(APITestCase):
+    """Класс для тестирования профилирования запросов администратором"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        profiles_dir = override_settings(PROFILES_DIR=self.directory.name)
+        profiles_dir.enable()
+        self.addCleanup(profiles_dir.disable)
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.admin = User.objects.create(email='admin@gmail.ru')
+        self.admin.groups.add(Group.objects.create(name='Администраторы'))
+        Ad.objects.create(title='phone', price=10000, author=self.user)
+
+    def login(self, user, claims=True):
+        token = UserTokenObtainPairSerializer.get_token(user).access_token if claims else AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_profile(self):
+        self.login(self.admin)
+
+        response = self.client.get(reverse('ads:ads_list'), {'ordering': 'price'}, HTTP_X_PROFILE='1')
+        profile_id = response['X-Profile-Id']
+        summary = self.client.get(reverse('profiles_retrieve', args=[profile_id]), {'file_type': 'txt'})
+        profile = self.client.get(reverse('profiles_retrieve', args=[profile_id]))
+
+        self.assertEqual(
+            response.json()['count'],
+            1
+        )
+        self.assertIn(
+            'Пик памяти tracemalloc',
+            b''.join(summary.streaming_content).decode()
+        )
+        self.assertEqual(
+            profile['Content-Disposition'],
+            f'attachment; filename="{profile_id}.prof"'
+        )
+
+    def test_profile_query_param(self):
+        self.login(self.admin)
+
+        response = self.client.get(reverse('ads:ads_list'), {'profile': '1'})
+
+        self.assertTrue(
+            (Path(self.directory.name) / f'{response["X-Profile-Id"]}.prof').exists()
+        )
+
+    def test_profile_not_admin(self):
+        for user in (None, self.user):
+            if user:
+                self.login(user)
+            response = self.client.get(reverse('ads:ads_list'), HTTP_X_PROFILE='1')
+
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_200_OK
+            )
+            self.assertNotIn(
+                'X-Profile-Id',
+                response
+            )
+        self.assertEqual(
+            list(Path(self.directory.name).iterdir()),
+            []
+        )
+
+    def test_download_requires_admin(self):
+        self.login(self.user)
+
+        response = self.client.get(reverse('profiles_retrieve', args=['6f1c2a4e-0000-4000-8000-000000000000']))
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+
+
+class SlowQueryLogTestCase(APITestCase):
+    """Класс для тестирования журнала медленных SQL-запросов"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.log_file = Path(self.directory.name) / 'slow_queries.log'
+        self.addCleanup(self.close_log)
+
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.ad = Ad.objects.create(title='phone', price=10000, author=self.user)
+        self.client.force_authenticate(self.user)
+
+    def close_log(self):
+        for handler in slow_query_logger.handlers[:]:
+            handler.close()
+            slow_query_logger.removeHandler(handler)
+
+    def test_slow_queries(self):
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_FILE=self.log_file):
+            response = self.client.get(reverse('ads:ads_retrieve', args=[self.ad.pk]))
+
+        slow_query = SlowQuery.objects.filter(sql__contains='"ads_ad"').first()
+        entries = [json.loads(line) for line in self.log_file.read_text(encoding='utf-8').splitlines()]
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            slow_query.view,
+            'ads:ads_retrieve'
+        )
+        self.assertEqual(
+            json.loads(slow_query.params),
+            [self.ad.pk]
+        )
+        self.assertIn(
+            'ads/mixins.py',
+            slow_query.stack
+        )
+        self.assertTrue(
+            set(plan_node_types(slow_query.plan)) & {'Index Scan', 'Seq Scan', 'Bitmap Heap Scan'}
+        )
+        self.assertEqual(
+            len(entries),
+            SlowQuery.objects.count()
+        )
+
+    def test_query_stats_unchanged(self):
+        url = reverse('ads:ads_retrieve', args=[self.ad.pk])
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=None, QUERY_BUDGET_MODE='log'):
+            expected = self.client.get(url).query_stats.count
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_FILE=self.log_file, QUERY_BUDGET_MODE='log'):
+            response = self.client.get(url)
+
+        self.assertEqual(
+            response.query_stats.count,
+            expected
+        )
+        self.assertTrue(
+            SlowQuery.objects.exists()
+        )
+
+    def test_threshold(self):
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=None, SLOW_QUERY_LOG_FILE=self.log_file):
+            self.client.get(reverse('ads:ads_retrieve', args=[self.ad.pk]))
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=60000, SLOW_QUERY_LOG_FILE=self.log_file):
+            self.client.get(reverse('ads:ads_retrieve', args=[self.ad.pk]))
+
+        self.assertEqual(
+            SlowQuery.objects.count(),
+            0
+        )
+        self.assertFalse(
+            self.log_file.exists()
+        )
+
+
+class IndexedQueriesTestCase(IndexedQueriesTestMixin, APITestCase):
+    """Класс для проверки, что горячие запросы на заполненной базе выполняются по индексам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed', '--until=2024-06-01T00:00:00+00:00', users=2000, ads=20000, reviews=50000, clear=True,
+                     password='password', stdout=StringIO())
+        cls.user = User.objects.order_by('pk').first()
+        cls.ad = Ad.objects.filter(review_count__gt=1).order_by('review_count', 'pk').first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def test_ads_feed(self):
+        first_page = self.client.get(reverse('ads:ads_feed')).json()
+
+        with self.assertQueriesUseIndexes():
+            response = self.client.get(first_page['next'])
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_ads_list(self):
+        with self.assertQueriesUseIndexes():
+            response = self.client.get(reverse('ads:ads_list'), {'page': 3, 'expand': 'author'})
+
+        self.assertEqual(
+            len(response.json()['results']),
+            4
+        )
+
+    def test_ad_retrieve(self):
+        with self.assertQueriesUseIndexes():
+            response = self.client.get(reverse('ads:ads_retrieve', args=[self.ad.pk]))
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_ad_reviews_list(self):
+        with self.assertQueriesUseIndexes():
+            response = self.client.get(reverse('ads:reviews_list'), {'ad': self.ad.pk})
+
+        self.assertEqual(
+            len(response.json()),
+            self.ad.review_count
+        )
+
+    def test_ad_autocomplete_misspelled(self):
+        with self.assertQueriesUseIndexes() as capture:
+            response = self.client.get(reverse('ads:ads_autocomplete'), {'q': 'телфон'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertTrue(any('%%>' in sql for sql, params in capture.queries))
+
+    def test_login_by_email(self):
+        self.client.force_authenticate(user=None)
+
+        with self.assertQueriesUseIndexes():
+            response = self.client.post(reverse('users:login'), {'email': self.user.email, 'password': 'password'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_users_list_by_email_prefix(self):
+        with self.assertQueriesUseIndexes():
+            response = self.client.get(reverse('users:users_list'), {'email': 'user19', 'expand': 'groups'})
+
+        self.assertEqual(
+            len(response.json()['results']),
+            20
+        )
+
+    def test_seq_scan_fails(self):
+        with self.assertRaises(AssertionError):
+            with self.assertQueriesUseIndexes():
+                list(Review.objects.order_by('text')[:5])
+
+    def test_filtered_count_fails(self):
+        with self.assertRaises(AssertionError):
+            with self.assertQueriesUseIndexes():
+                Ad.objects.filter(description__contains='диван').count()
+
+    def test_large_sort_fails(self):
+        with self.assertRaises(AssertionError):
+            with self.assertQueriesUseIndexes():
+                list(Ad.objects.filter(price__gte=0).order_by('description')[:5])
+
+
+class AdminTokenClaimsTestCase(APITestCase):
+    """Класс для тестирования проверки прав администратора по утверждениям JWT"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='test@gmail.ru')
+        self.admin = User.objects.create(email='admin@gmail.ru')
+        self.admin.groups.add(Group.objects.create(name='Администраторы'))
+        self.ad = Ad.objects.create(title='phone', price=10000, author=self.user)
+        self.url = reverse('ads:ads_update', args=[self.ad.pk])
+
+    def patch(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {'price': 9000})
+        return response, [query['sql'] for query in queries if 'auth_group' in query['sql']]
+
+    def test_admin_claim(self):
+        response, group_queries = self.patch(UserTokenObtainPairSerializer.get_token(self.admin).access_token)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            group_queries,
+            []
+        )
+
+    def test_token_without_claims(self):
+        response, group_queries = self.patch(AccessToken.for_user(self.admin))
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            len(group_queries),
+            1
+        )
+
+    def test_refresh_recomputes_claim(self):
+        alien = User.objects.create(email='alien@gmail.ru')
+        refresh = UserTokenObtainPairSerializer.get_token(alien)
+        alien.groups.add(Group.objects.get(name='Администраторы'))
+
+        stale_response, _ = self.patch(refresh.access_token)
+        access = self.client.post(reverse('users:token_refresh'), {'refresh': str(refresh)}).json()['access']
+        response, group_queries = self.patch(access)
+
+        self.assertEqual(
+            (stale_response.status_code, response.status_code),
+            (status.HTTP_403_FORBIDDEN, status.HTTP_200_OK)
+        )
+        self.assertEqual(
+            group_queries,
+            []
+        )
@@ -1,15 +1,20 @@
 from django.urls import path
 
 from ads.apps import AdsConfig
-from ads.views import (AdListAPIView, AdCreateAPIView, AdDestroyAPIView, AdUpdateAPIVIew, AdRetrieveAPIView,
-                       ReviewCreateAPIView, ReviewListAPIVIew, ReviewRetrieveAPIView, ReviewUpdateAPIView,
-                       ReviewDestroyAPIView)
+from ads.views import (AdListAPIView, AdFeedAPIView, AdSearchAPIView, AdAutocompleteAPIView, AdCreateAPIView,
+                       AdBulkCreateAPIView, AdDestroyAPIView, AdUpdateAPIVIew, AdRetrieveAPIView, ReviewCreateAPIView,
+                       ReviewListAPIVIew, ReviewRetrieveAPIView, ReviewUpdateAPIView, ReviewDestroyAPIView,
+                       AdExportAPIView, ReviewExportAPIView)
 
 app_name = AdsConfig.name
 
 urlpatterns = [
     path('', AdListAPIView.as_view(), name='ads_list'),
+    path('feed/', AdFeedAPIView.as_view(), name='ads_feed'),
+    path('search/', AdSearchAPIView.as_view(), name='ads_search'),
+    path('autocomplete/', AdAutocompleteAPIView.as_view(), name='ads_autocomplete'),
     path('create/', AdCreateAPIView.as_view(), name='ads_create'),
+    path('bulk_create/', AdBulkCreateAPIView.as_view(), name='ads_bulk_create'),
     path('retrieve/<int:pk>/', AdRetrieveAPIView.as_view(), name='ads_retrieve'),
     path('update/<int:pk>/', AdUpdateAPIVIew.as_view(), name='ads_update'),
     path('delete/<int:pk>/', AdDestroyAPIView.as_view(), name='ads_delete'),
@@ -18,4 +23,6 @@ urlpatterns = [
     path('reviews/retrieve/<int:pk>/', ReviewRetrieveAPIView.as_view(), name='reviews_retrieve'),
     path('reviews/update/<int:pk>/', ReviewUpdateAPIView.as_view(), name='reviews_update'),
     path('reviews/delete/<int:pk>/', ReviewDestroyAPIView.as_view(), name='reviews_delete'),
+    path('export/', AdExportAPIView.as_view(), name='ads_export'),
+    path('reviews/export/', ReviewExportAPIView.as_view(), name='reviews_export'),
 ]
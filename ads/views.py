@@ -1,46 +1,138 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import transaction
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Left
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import exceptions
+from rest_framework import exceptions, status
 from rest_framework.generics import ListAPIView, RetrieveAPIView, CreateAPIView, UpdateAPIView, DestroyAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
-
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ads.aggregates import review_added, review_removed
+from ads.cache import ads_list_cache
+from ads.export import EXPORT_FORMATS, CONTENT_TYPES, NDJSON, iter_export
+from ads.filters import AdFilter, AdFeedFilter, ReviewFilter
+from ads.mixins import (AnonymousListCacheMixin, ConditionalListMixin, ConditionalRetrieveMixin, ExpandMixin,
+                        SparseFieldsetMixin)
 from ads.models import Ad, Review
-from ads.pagination import AdsPagination
-from ads.serializers import AdSerializer, ReviewSerializer
-from users.permissions import IsAuthor, IsAdministrator
+from ads.pagination import AdsPagination, AdsCursorPagination
+from ads.serializers import (AdSerializer, AdListSerializer, AdCreateSerializer, AdBulkCreateSerializer, ReviewSerializer,
+                             AdAutocompleteQuerySerializer)
+from ads.suggestions import suggest_titles
+from config.query_budget import QueryBudget
+from config.server_timing import PhaseTimingMixin
+from users.permissions import IsAuthor, IsAdministrator, IsAdministratorGroupMember
 
 DENIED_MESSAGE = 'Только автор или администратор может работать с объектом'
 
 
-class AdListAPIView(ListAPIView):
-    queryset = Ad.objects.all()
-    serializer_class = AdSerializer
+class AdListAPIView(PhaseTimingMixin, AnonymousListCacheMixin, ConditionalListMixin, SparseFieldsetMixin, ExpandMixin,
+                    ListAPIView):
+    queryset = Ad.objects.defer('description')
+    annotated_fields = {'description_excerpt': Left('description', settings.ADS_DESCRIPTION_EXCERPT_LENGTH)}
+    serializer_class = AdListSerializer
     filter_backends = (DjangoFilterBackend,)
-    filterset_fields = ('title',)
+    filterset_class = AdFilter
+    pagination_class = AdsPagination
+    permission_classes = (AllowAny,)
+    required_model_fields = ('updated_at',)
+    query_budget = QueryBudget(queries=3, milliseconds=200)
+
+
+class AdFeedAPIView(AdListAPIView):
+    filterset_class = AdFeedFilter
+    pagination_class = AdsCursorPagination
+    required_model_fields = ('created_at', 'updated_at')
+    query_budget = QueryBudget(queries=2, milliseconds=200)
+
+
+class AdSearchAPIView(PhaseTimingMixin, SparseFieldsetMixin, ExpandMixin, ListAPIView):
+    queryset = AdListAPIView.queryset
+    annotated_fields = AdListAPIView.annotated_fields
+    serializer_class = AdListSerializer
+    filter_backends = ()
     pagination_class = AdsPagination
     permission_classes = (AllowAny,)
+    query_budget = QueryBudget(queries=3, milliseconds=200)
 
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            raise exceptions.ValidationError({'q': 'Укажите строку поиска'})
 
-class AdRetrieveAPIView(RetrieveAPIView):
+        query = SearchQuery(text, config='russian', search_type='websearch')
+        return (
+            super().get_queryset()
+            .filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', '-created_at', '-id')
+        )
+
+
+class AdAutocompleteAPIView(PhaseTimingMixin, APIView):
+    permission_classes = (AllowAny,)
+    # префикс, настройка транзакции и запрос похожих названий; внутри тестовой транзакции еще SAVEPOINT и RELEASE
+    query_budget = QueryBudget(queries=5, milliseconds=100)
+
+    @staticmethod
+    def get(request):
+        serializer = AdAutocompleteQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        suggestions = suggest_titles(serializer.validated_data['q'], serializer.validated_data['limit'])
+        return Response(suggestions)
+
+
+class AdRetrieveAPIView(PhaseTimingMixin, ConditionalRetrieveMixin, SparseFieldsetMixin, ExpandMixin,
+                        RetrieveAPIView):
     queryset = Ad.objects.all()
     serializer_class = AdSerializer
     permission_classes = (IsAuthenticated,)
+    query_budget = QueryBudget(queries=3, milliseconds=50)
 
 
-class AdCreateAPIView(CreateAPIView):
+class AdCreateAPIView(PhaseTimingMixin, CreateAPIView):
     queryset = Ad.objects.all()
-    serializer_class = AdSerializer
+    serializer_class = AdCreateSerializer
     permission_classes = (IsAuthenticated,)
+    query_budget = QueryBudget(queries=2, milliseconds=50)
 
     def perform_create(self, serializer):
-        ad = serializer.save()
-        ad.author = self.request.user
-        ad.save()
+        serializer.save(author=self.request.user)
 
 
-class AdUpdateAPIVIew(UpdateAPIView):
+class AdBulkCreateAPIView(PhaseTimingMixin, APIView):
+    permission_classes = (IsAuthenticated,)
+    query_budget = QueryBudget(queries=6, milliseconds=1000)
+
+    @staticmethod
+    def post(request):
+        context = {'request': request, 'batch_size': settings.ADS_BULK_CREATE_BATCH_SIZE}
+        serializer = AdBulkCreateSerializer(data=request.data, context=context)
+        serializer.is_valid(raise_exception=True)
+
+        created = []
+        if serializer.validated_data:
+            ads = serializer.save(author=request.user)
+            ads_list_cache.bump()
+            created = [
+                {'index': index, **data}
+                for index, data in zip(serializer.valid_indexes, AdCreateSerializer(ads, many=True).data)
+            ]
+
+        errors = [{'index': index, 'errors': errors} for index, errors in serializer.item_errors.items()]
+        status_code = status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'errors': errors}, status=status_code)
+
+
+class AdUpdateAPIVIew(PhaseTimingMixin, UpdateAPIView):
     queryset = Ad.objects.all()
     serializer_class = AdSerializer
     permission_classes = (IsAuthor | IsAdministrator, IsAuthenticated)
+    query_budget = QueryBudget(queries=4, milliseconds=50)
 
     def permission_denied(self, request, message=DENIED_MESSAGE, code=None):
         if request.authenticators and not request.successful_authenticator:
@@ -48,9 +140,10 @@ class AdUpdateAPIVIew(UpdateAPIView):
         raise exceptions.PermissionDenied(detail=DENIED_MESSAGE)
 
 
-class AdDestroyAPIView(DestroyAPIView):
+class AdDestroyAPIView(PhaseTimingMixin, DestroyAPIView):
     queryset = Ad.objects.all()
     permission_classes = (IsAuthor | IsAdministrator, IsAuthenticated)
+    query_budget = QueryBudget(queries=5, milliseconds=100)
 
     def permission_denied(self, request, message=DENIED_MESSAGE, code=None):
         if request.authenticators and not request.successful_authenticator:
@@ -58,16 +151,23 @@ class AdDestroyAPIView(DestroyAPIView):
         raise exceptions.PermissionDenied(detail=DENIED_MESSAGE)
 
 
-class ReviewListAPIVIew(ListAPIView):
+class ReviewListAPIVIew(PhaseTimingMixin, ConditionalListMixin, SparseFieldsetMixin, ListAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = ReviewFilter
     permission_classes = (IsAuthenticated,)
+    required_model_fields = ('updated_at',)
+    query_budget = QueryBudget(queries=3, milliseconds=200)
 
 
-class ReviewRetrieveAPIView(RetrieveAPIView):
+class ReviewRetrieveAPIView(PhaseTimingMixin, ConditionalRetrieveMixin, SparseFieldsetMixin,
+                            RetrieveAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthor | IsAdministrator, IsAuthenticated)
+    query_budget = QueryBudget(queries=4, milliseconds=50)
+    required_model_fields = ('author',)
 
     def permission_denied(self, request, message=DENIED_MESSAGE, code=None):
         if request.authenticators and not request.successful_authenticator:
@@ -75,21 +175,31 @@ class ReviewRetrieveAPIView(RetrieveAPIView):
         raise exceptions.PermissionDenied(detail=DENIED_MESSAGE)
 
 
-class ReviewCreateAPIView(CreateAPIView):
+class ReviewCreateAPIView(PhaseTimingMixin, CreateAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthenticated,)
+    query_budget = QueryBudget(queries=6, milliseconds=50)
 
     def perform_create(self, serializer):
-        review = serializer.save()
-        review.author = self.request.user
-        review.save()
+        with transaction.atomic():
+            review = serializer.save(author=self.request.user)
+            review_added(review)
 
 
-class ReviewUpdateAPIView(UpdateAPIView):
+class ReviewUpdateAPIView(PhaseTimingMixin, UpdateAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthor | IsAdministrator, IsAuthenticated)
+    query_budget = QueryBudget(queries=9, milliseconds=100)
+
+    def perform_update(self, serializer):
+        old_review = Review(pk=serializer.instance.pk, ad_id=serializer.instance.ad_id)
+        with transaction.atomic():
+            review = serializer.save()
+            if review.ad_id != old_review.ad_id:
+                review_removed(old_review)
+                review_added(review)
 
     def permission_denied(self, request, message=DENIED_MESSAGE, code=None):
         if request.authenticators and not request.successful_authenticator:
@@ -97,11 +207,47 @@ class ReviewUpdateAPIView(UpdateAPIView):
         raise exceptions.PermissionDenied(detail=DENIED_MESSAGE)
 
 
-class ReviewDestroyAPIView(DestroyAPIView):
+class ReviewDestroyAPIView(PhaseTimingMixin, DestroyAPIView):
     queryset = Review.objects.all()
     permission_classes = (IsAuthor | IsAdministrator, IsAuthenticated)
+    query_budget = QueryBudget(queries=7, milliseconds=100)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            review_removed(instance)
 
     def permission_denied(self, request, message=DENIED_MESSAGE, code=None):
         if request.authenticators and not request.successful_authenticator:
             raise exceptions.NotAuthenticated()
         raise exceptions.PermissionDenied(detail=DENIED_MESSAGE)
+
+
+class ExportAPIView(PhaseTimingMixin, APIView):
+    permission_classes = (IsAuthenticated, IsAdministratorGroupMember)
+    query_budget = QueryBudget(queries=3, milliseconds=1000)
+    export_name = None
+
+    def get(self, request):
+        export_format = request.query_params.get('file_type', NDJSON)
+        if export_format not in EXPORT_FORMATS:
+            raise exceptions.ValidationError({'file_type': f'Доступные форматы: {", ".join(EXPORT_FORMATS)}'})
+        try:
+            after_id = int(request.query_params.get('after_id', 0))
+        except ValueError:
+            raise exceptions.ValidationError({'after_id': 'Ожидается целое число'})
+
+        response = StreamingHttpResponse(
+            iter_export(self.export_name, export_format, after_id=after_id, chunk_size=settings.EXPORT_CHUNK_SIZE),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_name}.{export_format}"'
+        return response
+
+
+class AdExportAPIView(ExportAPIView):
+    export_name = 'ads'
+
+
+class ReviewExportAPIView(ExportAPIView):
+    export_name = 'reviews'
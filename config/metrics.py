@@ -0,0 +1,295 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from config.query_budget import QueryStats
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+
+# имя: (тип, описание, границы корзин гистограммы)
+METRICS = {
+    'http_requests_total': (COUNTER, 'Количество запросов по маршруту, методу и статусу', None),
+    'http_request_duration_seconds': (
+        HISTOGRAM, 'Время обработки запроса в секундах',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'http_request_db_queries': (
+        HISTOGRAM, 'Количество SQL-запросов на один запрос',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'http_response_size_bytes': (
+        HISTOGRAM, 'Размер тела ответа в байтах',
+        (100, 1000, 10000, 100000, 1000000, 10000000),
+    ),
+}
+
+
+# файл с суммой значений завершившихся процессов и блокировка каталога на время его обновления и чтения
+COMPACTED_FILE = 'compacted.json'
+LOCK_FILE = 'metrics.lock'
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def file_pid(path):
+    """PID процесса из имени файла <pid>-<суффикс>.json или None для служебных файлов"""
+    pid = path.name.split('-', 1)[0]
+    return int(pid) if pid.isdigit() else None
+
+
+def merge_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot:
+            if name not in METRICS:
+                continue
+            key = (name, tuple(tuple(label) for label in labels))
+            if isinstance(value, list):
+                current = merged.setdefault(key, [0] * len(value))
+                merged[key] = [left + right for left, right in zip(current, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in labels)
+
+
+class MetricsRegistry:
+    """Счетчики и гистограммы метрик процесса.
+
+    Обновления защищены блокировкой. Если задан directory, процесс раз в flush_interval секунд
+    сохраняет свои значения в отдельный файл каталога, а collect() суммирует файлы всех процессов,
+    поэтому /metrics любого воркера отдает общую картину. Файлы завершившихся процессов сворачиваются
+    в один, чтобы перезапуск воркеров не замедлял /metrics.
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._values = {}
+        self._last_flush = time.monotonic()
+        self.filename = f'{self._pid}-{uuid.uuid4().hex[:8]}.json'
+
+    def _ensure_own_process(self):
+        # после fork дочерний процесс начинает с нуля и пишет в свой файл, чтобы не удвоить значения родителя
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._ensure_own_process()
+            self._values[key] = self._values.get(key, 0) + amount
+        self._maybe_flush()
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(labels))
+        with self._lock:
+            self._ensure_own_process()
+            # значения по корзинам (последняя - +Inf), затем сумма и количество
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(buckets) + 3)
+            index = next((position for position, bound in enumerate(buckets) if value <= bound), len(buckets))
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+        self._maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            self._ensure_own_process()
+            return [
+                [name, [list(label) for label in labels], list(value) if isinstance(value, list) else value]
+                for (name, labels), value in self._values.items()
+            ]
+
+    def _maybe_flush(self):
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / self.filename
+        temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        temporary.write_text(json.dumps(self.snapshot()), encoding='utf-8')
+        os.replace(temporary, path)
+
+    @contextmanager
+    def _directory_lock(self):
+        with open(self.directory / LOCK_FILE, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self, path):
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def compact(self):
+        """Переносит значения завершившихся процессов в COMPACTED_FILE и удаляет их файлы.
+
+        Вызывается под блокировкой каталога. Имена перенесенных файлов сохраняются вместе с суммой, поэтому
+        если процесс упадет до удаления файлов, при следующем вызове они будут удалены, а не учтены повторно.
+        """
+        compacted_path = self.directory / COMPACTED_FILE
+        compacted = self._read(compacted_path) or {'files': [], 'values': []}
+        for name in compacted['files']:
+            (self.directory / name).unlink(missing_ok=True)
+
+        dead = [path for pattern in ('*.json', '*.tmp') for path in self.directory.glob(pattern)
+                if file_pid(path) is not None and not process_alive(file_pid(path))]
+        if not dead:
+            return
+
+        snapshots = [compacted['values']]
+        for path in dead:
+            if path.suffix == '.json':
+                snapshots.append(self._read(path) or [])
+        values = [
+            [name, [list(label) for label in labels], value]
+            for (name, labels), value in merge_snapshots(snapshots).items()
+        ]
+        temporary = compacted_path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({'files': [path.name for path in dead], 'values': values}),
+                             encoding='utf-8')
+        os.replace(temporary, compacted_path)
+        for path in dead:
+            path.unlink(missing_ok=True)
+
+    def collect(self):
+        """Суммирует значения этого процесса, файлы остальных процессов и сумму завершившихся"""
+        snapshots = [self.snapshot()]
+        if self.directory and self.directory.exists():
+            with self._directory_lock():
+                self.compact()
+                compacted = self._read(self.directory / COMPACTED_FILE)
+                if compacted:
+                    snapshots.append(compacted['values'])
+                for path in self.directory.glob('*.json'):
+                    if path.name == self.filename or file_pid(path) is None:
+                        continue
+                    snapshot = self._read(path)
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+        return merge_snapshots(snapshots)
+
+    def render(self):
+        """Текст в формате экспозиции Prometheus"""
+        values = self.collect()
+        lines = []
+        for name, (metric_type, description, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for (metric_name, labels), value in sorted(values.items()):
+                if metric_name != name:
+                    continue
+                if metric_type == COUNTER:
+                    lines.append(f'{name}{{{format_labels(labels)}}} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip((*buckets, '+Inf'), value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{format_labels((*labels, ("le", bound)))}}} {cumulative}')
+                lines.append(f'{name}_sum{{{format_labels(labels)}}} {value[-2]}')
+                lines.append(f'{name}_count{{{format_labels(labels)}}} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+
+registry = MetricsRegistry(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+atexit.register(registry.flush)
+
+
+class MetricsMiddleware:
+    """Записывает для каждого запроса количество, статус, длительность, число SQL-запросов и размер ответа.
+
+    Маршрут определяется по имени URL (например ads:ads_list); для потоковых ответов длительность
+    и размер учитываются по окончании отдачи тела.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        labels = (('view', match.view_name if match else 'unmatched'), ('method', request.method))
+        if response.streaming:
+            response.streaming_content = self.stream(response.streaming_content, response.status_code, labels,
+                                                     started, stats)
+        else:
+            self.record(labels, response.status_code, time.perf_counter() - started, stats.count, len(response.content))
+        return response
+
+    def stream(self, content, status_code, labels, started, stats):
+        size = 0
+        with connection.execute_wrapper(stats):
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        self.record(labels, status_code, time.perf_counter() - started, stats.count, size)
+
+    @staticmethod
+    def record(labels, status_code, duration, queries, size):
+        registry.inc('http_requests_total', (*labels, ('status', str(status_code))))
+        registry.observe('http_request_duration_seconds', labels, duration)
+        registry.observe('http_request_db_queries', labels, queries)
+        registry.observe('http_response_size_bytes', labels, size)
+
+
+def metrics_view(request):
+    """Метрики в формате Prometheus; если задан METRICS_TOKEN, нужен заголовок Authorization: Bearer <токен>"""
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get('Authorization', '')
+        if not constant_time_compare(authorization, f'Bearer {settings.METRICS_TOKEN}'):
+            return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,107 @@
+import cProfile
+import io
+import pstats
+import threading
+import tracemalloc
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from rest_framework import exceptions
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from users.permissions import IsAdministratorGroupMember
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = 'profile'
+PROFILE_FORMATS = ('prof', 'txt')
+
+# tracemalloc глобален для процесса, поэтому одновременно профилируется только один запрос
+profiling_lock = threading.Lock()
+
+
+def profiling_requested(request):
+    return request.headers.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_PARAM) == '1'
+
+
+def is_administrator(request):
+    """Аутентифицирует запрос теми же классами, что и DRF, и проверяет группу администраторов"""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return drf_request.user.is_authenticated and IsAdministratorGroupMember().has_permission(drf_request, None)
+    except exceptions.APIException:
+        return False
+
+
+def write_summary(path, profiler, snapshot, peak, limit=40):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    stream.write(f'\nПик памяти tracemalloc: {peak / 1024:.1f} КиБ\nКрупнейшие выделения памяти:\n')
+    for statistic in snapshot.statistics('lineno')[:limit]:
+        stream.write(f'{statistic}\n')
+    path.write_text(stream.getvalue(), encoding='utf-8')
+
+
+class ProfilingMiddleware:
+    """По заголовку X-Profile: 1 или параметру ?profile=1 от администратора выполняет запрос под cProfile
+    и tracemalloc. Результат сохраняется в PROFILES_DIR как <id>.prof (pstats) и <id>.txt (сводка),
+    а id возвращается в заголовке X-Profile-Id. Тело потоковых ответов не профилируется."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling_requested(request) or not is_administrator(request):
+            return self.get_response(request)
+        if not profiling_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Skipped'] = 'busy'
+            return response
+
+        try:
+            return self.profile(request)
+        finally:
+            profiling_lock.release()
+
+    def profile(self, request):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        try:
+            response = profiler.runcall(self.get_response, request)
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        profile_id = str(uuid.uuid4())
+        directory = Path(settings.PROFILES_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(directory / f'{profile_id}.prof')
+        write_summary(directory / f'{profile_id}.txt', profiler, snapshot, peak)
+
+        response['X-Profile-Id'] = profile_id
+        return response
+
+
+class ProfileRetrieveAPIView(APIView):
+    """Скачивание сохраненного профиля: ?file_type=prof (по умолчанию, для pstats/snakeviz) или txt"""
+    permission_classes = (IsAuthenticated, IsAdministratorGroupMember)
+
+    def get(self, request, profile_id):
+        file_type = request.query_params.get('file_type', 'prof')
+        if file_type not in PROFILE_FORMATS:
+            raise exceptions.ValidationError({'file_type': f'Доступные форматы: {", ".join(PROFILE_FORMATS)}'})
+
+        path = Path(settings.PROFILES_DIR) / f'{profile_id}.{file_type}'
+        if not path.exists():
+            raise Http404
+        return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
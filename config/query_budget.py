@@ -0,0 +1,112 @@
+import logging
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Допустимое число SQL-запросов и их суммарное время в миллисекундах на один запрос к view
+QueryBudget = namedtuple('QueryBudget', ('queries', 'milliseconds'), defaults=(None,))
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    """execute_wrapper, который считает SQL-запросы и их суммарное время"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+    @property
+    def milliseconds(self):
+        return self.duration * 1000
+
+
+def check_budget(view_name, budget, stats):
+    """Возвращает описание нарушения бюджета или None"""
+    problems = []
+    if stats.count > budget.queries:
+        problems.append(f'{stats.count} SQL-запросов при бюджете {budget.queries}')
+    if budget.milliseconds is not None and stats.milliseconds > budget.milliseconds:
+        problems.append(f'{stats.milliseconds:.1f} мс в SQL при бюджете {budget.milliseconds} мс')
+    if problems:
+        return f'{view_name}: {", ".join(problems)}'
+
+
+class QueryBudgetMiddleware:
+    """Сверяет число и время SQL-запросов с атрибутом query_budget класса view.
+
+    Режим задается настройкой QUERY_BUDGET_MODE: off - не проверять, log - писать предупреждение,
+    raise - выбрасывать QueryBudgetExceeded. Замер прикрепляется к ответу как response.query_stats.
+    Для потоковых ответов учитываются и запросы, выполненные при отдаче тела.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.QUERY_BUDGET_MODE == 'off':
+            return self.get_response(request)
+
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+
+        budget = getattr(request, 'query_budget', None)
+        response.query_stats = stats
+        response.query_budget = budget
+        if budget is None:
+            return response
+
+        view_name = request.resolver_match.view_name
+        if response.streaming:
+            response.streaming_content = self.stream(response.streaming_content, view_name, budget, stats)
+        else:
+            self.report(check_budget(view_name, budget, stats))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        request.query_budget = getattr(view_class, 'query_budget', None)
+
+    def stream(self, content, view_name, budget, stats):
+        with connection.execute_wrapper(stats):
+            yield from content
+        self.report(check_budget(view_name, budget, stats))
+
+    @staticmethod
+    def report(violation):
+        if violation is None:
+            return
+        if settings.QUERY_BUDGET_MODE == 'raise':
+            raise QueryBudgetExceeded(violation)
+        logger.warning(violation)
+
+
+class QueryBudgetTestMixin:
+    """Проверки бюджета запросов для тестов: ответ должен пройти через QueryBudgetMiddleware.
+
+    Проверяется только число запросов: время зависит от загрузки машины и остается на QUERY_BUDGET_MODE=log.
+    """
+
+    def assertWithinQueryBudget(self, response):
+        budget = response.query_budget
+        self.assertIsNotNone(budget, 'У view не задан query_budget')
+        if response.streaming:
+            b''.join(response.streaming_content)
+
+        stats = response.query_stats
+        self.assertLessEqual(stats.count, budget.queries, 'Превышен бюджет SQL-запросов')
@@ -0,0 +1,134 @@
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseTimer:
+    """Время фаз обработки запроса и доля SQL внутри каждой из них"""
+
+    def __init__(self):
+        self.phases = {}
+        self.phase_db = {}
+        self.db = 0.0
+        self.queries = 0
+        self._active = []
+
+    @contextmanager
+    def measure(self, name):
+        self._active.append(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._active.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.db += duration
+            self.queries += 1
+            for name in set(self._active):
+                self.phase_db[name] = self.phase_db.get(name, 0.0) + duration
+
+    def breakdown(self, total):
+        """Миллисекунды по фазам: auth и permission вместе с их SQL, db - все SQL-запросы,
+        serialize - время кода view и сериализатора без SQL, render - рендеринг ответа"""
+        view = self.phases.get('view', 0.0)
+        own_phases = sum(self.phases.get(name, 0.0) for name in ('auth', 'permission', 'render'))
+        view_db = self.phase_db.get('view', 0.0) - sum(
+            self.phase_db.get(name, 0.0) for name in ('auth', 'permission', 'render')
+        )
+        result = {
+            'auth': self.phases.get('auth', 0.0),
+            'permission': self.phases.get('permission', 0.0),
+            'db': self.db,
+            'serialize': max(view - own_phases - view_db, 0.0),
+            'render': self.phases.get('render', 0.0),
+            'total': total,
+        }
+        return {name: round(value * 1000, 3) for name, value in result.items()}
+
+
+def get_timer(request):
+    return getattr(request, 'phase_timer', None)
+
+
+@contextmanager
+def phase(request, name):
+    timer = get_timer(request)
+    if timer is None:
+        yield
+    else:
+        with timer.measure(name):
+            yield
+
+
+class ServerTimingMiddleware:
+    """Для доли запросов SERVER_TIMING_SAMPLE_RATE замеряет фазы DRF-view и отдает их в заголовке Server-Timing
+    и строкой JSON в логе config.server_timing"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.SERVER_TIMING_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+
+        timer = request.phase_timer = PhaseTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        breakdown = timer.breakdown(time.perf_counter() - started)
+
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration}' + (f';desc="{timer.queries} queries"' if name == 'db' else '')
+            for name, duration in breakdown.items()
+        )
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': timer.queries,
+            'timing_ms': breakdown,
+        }))
+        return response
+
+
+class PhaseTimingMixin:
+    """Размечает фазы жизненного цикла DRF-view для ServerTimingMiddleware; без замера ничего не делает"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with phase(request, 'view'):
+            return super().dispatch(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        with phase(request, 'auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with phase(request, 'permission'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with phase(request, 'permission'):
+            super().check_object_permissions(request, obj)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if get_timer(request) is not None and not response.streaming and hasattr(response, 'render'):
+            with phase(request, 'render'):
+                response.render()
+        return response
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'users',
     'ads',
@@ -55,6 +56,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',
+    'config.server_timing.ServerTimingMiddleware',
+    'config.profiling.ProfilingMiddleware',
+    'ads.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -63,6 +68,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'config.query_budget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -96,7 +102,7 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST'),
-        'PORT': int(os.getenv('POSTGRES_PORT'))
+        'PORT': int(os.getenv('POSTGRES_PORT')),
     }
 }
 
@@ -119,6 +125,12 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Хэши паролей при регистрации и смене пароля считаются не больше чем в PASSWORD_HASHING_WORKERS потоках процесса;
+# запросы сверх PASSWORD_HASHING_QUEUE ожидающих получают 503. Ожидающий запрос держит поток сервера, поэтому
+# PASSWORD_HASHING_WORKERS + PASSWORD_HASHING_QUEUE должно быть заметно меньше числа потоков воркера
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS') or 2)
+PASSWORD_HASHING_QUEUE = int(os.getenv('PASSWORD_HASHING_QUEUE') or 2)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -154,7 +166,7 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -164,6 +176,54 @@ REST_FRAMEWORK = {
     ],
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.getenv('CACHE_LOCATION') or '',
+    }
+}
+
+ADS_LIST_CACHE_TIMEOUT = 300
+ADS_DESCRIPTION_EXCERPT_LENGTH = 200
+ADS_BULK_CREATE_MAX_ITEMS = 5000
+ADS_BULK_CREATE_BATCH_SIZE = 1000
+
+EXPORT_CHUNK_SIZE = 2000
+
+ADS_AUTOCOMPLETE_LIMIT = 10
+ADS_AUTOCOMPLETE_MAX_LIMIT = 20
+ADS_AUTOCOMPLETE_CACHE_SIZE = 1024
+ADS_AUTOCOMPLETE_CACHE_TTL = 60
+# минимальная похожесть названия на введенный текст (word_similarity из pg_trgm) для автодополнения с опечатками
+ADS_AUTOCOMPLETE_SIMILARITY = 0.4
+# предельное время запроса похожих названий в мс; по таймауту автодополнение отдает только совпадения по префиксу
+ADS_AUTOCOMPLETE_FUZZY_TIMEOUT_MS = 50
+
+USERS_AUTH_CACHE_SIZE = 10000
+USERS_AUTH_CACHE_TTL = 60
+# Имя кэша из CACHES для общего между процессами кэша пользователей; без него кэш живет в памяти процесса
+USERS_AUTH_CACHE_BACKEND = os.getenv('USERS_AUTH_CACHE_BACKEND') or None
+
+# off - не проверять бюджеты SQL-запросов view, log - писать предупреждения, raise - выбрасывать исключение
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE') or ('log' if DEBUG else 'off')
+
+# Каталог, через который воркеры обмениваются метриками; без него /metrics показывает только текущий процесс
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.getenv('METRICS_TOKEN') or None
+
+# Доля запросов (от 0 до 1), для которых замеряются фазы обработки и отдается заголовок Server-Timing
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv('SERVER_TIMING_SAMPLE_RATE') or 0)
+
+# Каталог для профилей запросов, снятых по заголовку X-Profile: 1 от администратора
+PROFILES_DIR = os.getenv('PROFILES_DIR') or BASE_DIR / 'profiles'
+
+# SQL-запросы дольше порога записываются с планом EXPLAIN в лог и в админку; без значения запись выключена
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS')) if os.getenv('SLOW_QUERY_THRESHOLD_MS') else None
+SLOW_QUERY_LOG_FILE = os.getenv('SLOW_QUERY_LOG_FILE') or BASE_DIR / 'logs' / 'slow_queries.log'
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUP_COUNT = 5
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -179,6 +239,14 @@ EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL') == 'True'
 SERVER_EMAIL = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Очередь писем OutboxEmail: попыток на письмо, задержка первого повтора и ее предел в секундах (дальше - вдвое
+# больше с каждой попыткой), время аренды забранного письма и размер пачки на одно SMTP-соединение
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 30
+OUTBOX_MAX_RETRY_DELAY = 3600
+OUTBOX_LEASE = 300
+OUTBOX_BATCH_SIZE = 50
+
 SWAGGER_SETTINGS = {
    'SECURITY_DEFINITIONS': {
       'Bearer': {
@@ -23,6 +23,9 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from config.metrics import metrics_view
+from config.profiling import ProfileRetrieveAPIView
+
 schema_view = get_schema_view(
    openapi.Info(
       title="Snippets API",
@@ -42,4 +45,6 @@ urlpatterns = [
     path('ads/', include('ads.urls', namespace='ads')),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('metrics', metrics_view, name='metrics'),
+    path('profiles/<uuid:profile_id>/', ProfileRetrieveAPIView.as_view(), name='profiles_retrieve'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,5 +1,13 @@
 from django.contrib import admin
 
-from users.models import User
+from users.models import OutboxEmail, User
 
 admin.site.register(User)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'subject', 'status', 'attempts', 'available_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
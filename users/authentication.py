@@ -0,0 +1,77 @@
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from ads.cache import LRUCache
+
+
+class UserCache:
+    """Пользователи по id для аутентификации по JWT.
+
+    По умолчанию хранятся в LRU-кэше процесса; если задан backend (имя кэша из CACHES), - в общем кэше,
+    чтобы изменение пользователя в одном процессе сбрасывало запись для всех.
+    """
+    prefix = 'users:auth'
+
+    def __init__(self, maxsize, ttl, backend=None):
+        self.ttl = ttl
+        self.backend = backend
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def make_key(self, user_id):
+        return f'{self.prefix}:{user_id}'
+
+    def get(self, user_id):
+        if self.backend:
+            return caches[self.backend].get(self.make_key(user_id))
+        user = self.local.get(self.make_key(user_id))
+        # экземпляр из кэша процесса не отдается напрямую: view может изменить request.user
+        return copy.copy(user) if user is not None else None
+
+    def set(self, user_id, user):
+        if self.backend:
+            caches[self.backend].set(self.make_key(user_id), user, timeout=self.ttl)
+        else:
+            self.local.set(self.make_key(user_id), copy.copy(user))
+
+    def delete(self, user_id):
+        if self.backend:
+            caches[self.backend].delete(self.make_key(user_id))
+        else:
+            self.local.delete(self.make_key(user_id))
+
+    def clear(self):
+        self.local.clear()
+
+
+user_cache = UserCache(
+    maxsize=settings.USERS_AUTH_CACHE_SIZE,
+    ttl=settings.USERS_AUTH_CACHE_TTL,
+    backend=settings.USERS_AUTH_CACHE_BACKEND,
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, который берет пользователя из user_cache и обращается к базе только при промахе"""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+            return user
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_user_cache_backend(app_configs, **kwargs):
+    """Кэш пользователей в памяти процесса не сбрасывается при изменениях, сделанных другими процессами"""
+    if settings.USERS_AUTH_CACHE_BACKEND:
+        return []
+    return [Warning(
+        'Кэш пользователей при аутентификации живет в памяти процесса (USERS_AUTH_CACHE_BACKEND не задан)',
+        hint='При запуске в нескольких процессах укажите в USERS_AUTH_CACHE_BACKEND общий кэш из CACHES, иначе '
+             'деактивация и смена пароля в одном процессе видны другим только через USERS_AUTH_CACHE_TTL секунд',
+        id='users.W001',
+    )]
@@ -0,0 +1,66 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from users.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди OutboxEmail: пачками через одно SMTP-соединение, с повторами при ошибках'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='количество параллельных обработчиков')
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE,
+                            help='сколько писем забирать и отправлять через одно соединение')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='пауза в секундах, когда очередь пуста')
+        parser.add_argument('--once', action='store_true', help='завершиться, когда готовых к отправке писем не останется')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--concurrency и --batch-size должны быть положительными')
+
+        self.stopping = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: self.stopping.set())
+
+        self.sent = 0
+        self.lock = threading.Lock()
+        if options['concurrency'] == 1:
+            self.work(options['batch_size'], options['poll_interval'], options['once'])
+        else:
+            workers = [
+                threading.Thread(target=self.run_thread,
+                                 args=(options['batch_size'], options['poll_interval'], options['once']))
+                for _ in range(options['concurrency'])
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        self.stdout.write(self.style.SUCCESS(f'Отправлено писем: {self.sent}'))
+
+    def run_thread(self, batch_size, poll_interval, once):
+        try:
+            self.work(batch_size, poll_interval, once)
+        finally:
+            connection.close()
+
+    def work(self, batch_size, poll_interval, once):
+        while not self.stopping.is_set():
+            claimed, sent = process_batch(batch_size)
+            with self.lock:
+                self.sent += sent
+            if sent:
+                self.stdout.write(f'отправлено {sent} из {claimed}')
+            if not claimed:
+                if once:
+                    return
+                # соединение с базой может устареть за время простоя (CONN_MAX_AGE, разрыв сервером)
+                close_old_connections()
+                self.stopping.wait(poll_interval)
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_user_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=300, verbose_name='тема')),
+                ('message', models.TextField(verbose_name='текст')),
+                ('from_email', models.CharField(blank=True, max_length=300, null=True, verbose_name='отправитель')),
+                ('recipients', models.JSONField(verbose_name='получатели')),
+                ('status', models.CharField(choices=[('pending', 'ожидает отправки'), ('sending', 'отправляется'), ('sent', 'отправлено'), ('failed', 'не отправлено')], default='pending', max_length=20, verbose_name='статус')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='попыток отправки')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='следующая попытка не раньше')),
+                ('last_error', models.TextField(blank=True, verbose_name='последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата создания')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='дата отправки')),
+            ],
+            options={
+                'verbose_name': 'письмо в очереди',
+                'verbose_name_plural': 'очередь писем',
+                'indexes': [models.Index(condition=models.Q(('status__in', ('pending', 'sending'))), fields=['available_at', 'id'], name='outbox_email_available_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -28,3 +29,40 @@ class User(AbstractUser):
 
     def __str__(self):
         return f'{self.email}'
+
+
+class OutboxEmail(models.Model):
+    """Модель письма в очереди на отправку фоновым обработчиком run_worker"""
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'ожидает отправки'),
+        (SENDING, 'отправляется'),
+        (SENT, 'отправлено'),
+        (FAILED, 'не отправлено'),
+    )
+
+    subject = models.CharField(max_length=300, verbose_name='тема')
+    message = models.TextField(verbose_name='текст')
+    from_email = models.CharField(max_length=300, verbose_name='отправитель', blank=True, null=True)
+    recipients = models.JSONField(verbose_name='получатели')
+    status = models.CharField(max_length=20, verbose_name='статус', choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0, verbose_name='попыток отправки')
+    available_at = models.DateTimeField(default=timezone.now, verbose_name='следующая попытка не раньше')
+    last_error = models.TextField(verbose_name='последняя ошибка', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='дата создания')
+    sent_at = models.DateTimeField(verbose_name='дата отправки', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'письмо в очереди'
+        verbose_name_plural = 'очередь писем'
+        indexes = (
+            models.Index(fields=('available_at', 'id'), name='outbox_email_available_idx',
+                         condition=models.Q(status__in=('pending', 'sending'))),
+        )
+
+    def __str__(self):
+        return f'{self.subject} -> {", ".join(self.recipients)}'
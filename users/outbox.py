@@ -0,0 +1,95 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(subject, message, recipient_list, from_email=None):
+    """Ставит письмо в очередь; оно будет отправлено командой run_worker после коммита транзакции"""
+    return OutboxEmail.objects.create(subject=subject, message=message, recipients=list(recipient_list),
+                                      from_email=from_email)
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед повторной попыткой: OUTBOX_RETRY_DELAY, вдвое больше и т.д."""
+    return min(settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1), settings.OUTBOX_MAX_RETRY_DELAY)
+
+
+def claim_batch(batch_size):
+    """Забирает до batch_size готовых к отправке писем.
+
+    Строки блокируются с SKIP LOCKED, поэтому параллельные обработчики получают разные письма. Забранное письмо
+    получает статус sending и срок аренды OUTBOX_LEASE секунд: если обработчик упадет, не отправив его,
+    по истечении срока письмо заберет другой обработчик.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=(OutboxEmail.PENDING, OutboxEmail.SENDING), available_at__lte=now)
+            .order_by('available_at', 'id')[:batch_size]
+        )
+        if emails:
+            OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                status=OutboxEmail.SENDING,
+                available_at=now + timedelta(seconds=settings.OUTBOX_LEASE),
+                attempts=F('attempts') + 1,
+            )
+    for email in emails:
+        email.attempts += 1
+    return emails
+
+
+def mark_sent(email):
+    OutboxEmail.objects.filter(pk=email.pk).update(status=OutboxEmail.SENT, sent_at=timezone.now(), last_error='')
+
+
+def mark_failed(email, error):
+    if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        status, available_at = OutboxEmail.FAILED, email.available_at
+    else:
+        status, available_at = OutboxEmail.PENDING, timezone.now() + timedelta(seconds=retry_delay(email.attempts))
+    OutboxEmail.objects.filter(pk=email.pk).update(status=status, available_at=available_at, last_error=error)
+    logger.warning('Письмо %s не отправлено (попытка %s): %s', email.pk, email.attempts, error)
+
+
+def send_batch(emails):
+    """Отправляет письма через одно соединение с почтовым сервером; после ошибки соединение открывается заново.
+
+    Возвращает количество отправленных писем.
+    """
+    sent = 0
+    connection = get_connection()
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject, email.message, email.from_email, email.recipients,
+                                   connection=connection)
+            try:
+                connection.open()
+                message.send()
+            except Exception as exc:
+                connection.close()
+                mark_failed(email, f'{type(exc).__name__}: {exc}')
+            else:
+                mark_sent(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent
+
+
+def process_batch(batch_size):
+    """Забирает и отправляет одну пачку писем; возвращает (забрано, отправлено)"""
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+    return len(emails), send_batch(emails)
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UsersCursorPagination(CursorPagination):
+    """Курсорная пагинация списка пользователей по уникальной почте: страница читается по индексу без COUNT(*)"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('email',)
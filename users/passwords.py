@@ -0,0 +1,37 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Слишком много одновременных запросов со сменой пароля, повторите попытку позже'
+    default_code = 'password_hashing_busy'
+
+
+class PasswordHasherPool:
+    """Хэширует пароли в ограниченном пуле потоков.
+
+    Одновременно вычисляется не больше workers хэшей, поэтому всплеск регистраций не занимает все ядра, а ждать
+    своей очереди могут не больше queue_size запросов: остальные сразу получают 503. Запросы в пуле и в очереди
+    держат свои потоки сервера, поэтому workers + queue_size должно быть меньше числа потоков воркера.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def hash(self, raw_password):
+        if not self.slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            return self.executor.submit(make_password, raw_password).result()
+        finally:
+            self.slots.release()
+
+
+password_hasher = PasswordHasherPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE)
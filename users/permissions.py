@@ -1,16 +1,35 @@
 from rest_framework.permissions import BasePermission
 
+ADMIN_GROUP = 'Администраторы'
+
+# Утверждение access-токена, которое выдают UserTokenObtainPairSerializer и UserTokenRefreshSerializer
+ADMIN_CLAIM = 'is_admin'
+
+
+def is_administrator(request):
+    """Членство в группе администраторов из утверждения токена; для токенов без него - запросом к базе"""
+    claims = getattr(request.auth, 'payload', None) or {}
+    if ADMIN_CLAIM in claims:
+        return bool(claims[ADMIN_CLAIM])
+    return request.user.groups.filter(name=ADMIN_GROUP).exists()
+
 
 class IsAuthor(BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return request.user == obj.author
+        return obj.author_id is not None and obj.author_id == request.user.pk
 
 
 class IsAdministrator(BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return request.user.groups.filter(name='Администраторы').exists()
+        return is_administrator(request)
+
+
+class IsAdministratorGroupMember(BasePermission):
+
+    def has_permission(self, request, view):
+        return is_administrator(request)
 
 
 class IsUserHimself(BasePermission):
@@ -1,6 +1,14 @@
 from rest_framework import serializers
+from django.db import models
+from django.db.models import Exists, OuterRef
+from rest_framework import exceptions
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
 
 from users.models import User
+from users.passwords import password_hasher
+from users.permissions import ADMIN_CLAIM, ADMIN_GROUP
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -11,7 +19,80 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class UserCreateUpdateSerializer(serializers.ModelSerializer):
+    """Регистрация одним INSERT с уже посчитанным хэшем пароля; изменение записывает только измененные колонки"""
 
     class Meta:
         model = User
         fields = ('email', 'password', 'first_name', 'last_name', 'phone', 'image', )
+        extra_kwargs = {'password': {'write_only': True}}
+
+    def create(self, validated_data):
+        validated_data['password'] = password_hasher.hash(validated_data['password'])
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        if 'password' in validated_data:
+            validated_data['password'] = password_hasher.hash(validated_data['password'])
+        # пароль и файлы записываются всегда: FieldFile сравнивается только по имени файла, и новый аватар
+        # с тем же именем выглядел бы неизмененным
+        changed = [
+            name for name, value in validated_data.items()
+            if name == 'password' or isinstance(User._meta.get_field(name), models.FileField)
+            or getattr(instance, name) != value
+        ]
+        for name in changed:
+            setattr(instance, name, validated_data[name])
+        if changed:
+            instance.save(update_fields=changed)
+        return instance
+
+
+class UserListSerializer(serializers.ModelSerializer):
+    """Краткие данные пользователя для списка; группы добавляются по параметру ?expand=groups"""
+
+    class Meta:
+        model = User
+        fields = ('id', 'email', 'first_name', 'last_name', 'phone', 'image', 'role')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'groups' in self.context.get('expand', ()):
+            self.fields['groups'] = serializers.SlugRelatedField(many=True, read_only=True, slug_field='name')
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = User
+        fields = ('id', 'first_name', 'image')
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Пара токенов с признаком администратора, чтобы проверки прав не обращались к базе"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[ADMIN_CLAIM] = user.groups.filter(name=ADMIN_GROUP).exists()
+        return token
+
+
+class UserTokenRefreshSerializer(TokenRefreshSerializer):
+    """Обновление access-токена с признаком администратора, заново прочитанным из базы одним запросом"""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = (
+            User.objects
+            .filter(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+            .annotate(is_admin=Exists(User.groups.through.objects.filter(user_id=OuterRef('pk'),
+                                                                         group__name=ADMIN_GROUP)))
+            .values('is_active', 'is_admin')
+            .first()
+        )
+        if user is None or not user['is_active']:
+            raise exceptions.AuthenticationFailed('Пользователь не найден или неактивен', code='user_inactive')
+        access[ADMIN_CLAIM] = user['is_admin']
+        data['access'] = str(access)
+        return data
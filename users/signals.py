@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from users.authentication import user_cache
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Сбрасывает пользователя при сохранении (в том числе смене пароля и деактивации) и удалении.
+
+    Повторный сброс после коммита убирает запись, которую параллельный запрос успел прочитать до изменения.
+    """
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    user_cache.delete(user_id)
+    transaction.on_commit(lambda: user_cache.delete(user_id))
@@ -1,8 +1,30 @@
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from smtplib import SMTPException
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-from users.models import User
+from config.query_budget import QueryBudgetTestMixin
+from users.authentication import UserCache, user_cache
+from users.checks import check_user_cache_backend
+from users.models import OutboxEmail, User
+from users.outbox import enqueue_email
+from users.passwords import PasswordHasherPool, PasswordHashingBusy, password_hasher
 
 
 class UnauthorizedUserTestCase(APITestCase):
@@ -148,7 +170,7 @@ class UserHimselfTestCase(APITestCase):
             status.HTTP_200_OK
         )
         self.assertEqual(
-            data[0]['first_name'],
+            data['results'][0]['first_name'],
             'danil'
         )
 
@@ -258,8 +280,8 @@ class AlienUserTestCase(APITestCase):
             status.HTTP_200_OK
         )
         self.assertEqual(
-            data[0]['first_name'],
-            'danil'
+            [user['first_name'] for user in data['results']],
+            ['kirill', 'danil']
         )
 
     def test_users_retrieve(self):
@@ -296,3 +318,480 @@ class AlienUserTestCase(APITestCase):
             response.status_code,
             status.HTTP_403_FORBIDDEN
         )
+
+
+@override_settings(QUERY_BUDGET_MODE='log', EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class UserQueryBudgetTestCase(QueryBudgetTestMixin, APITestCase):
+    """Класс для проверки бюджетов SQL-запросов view приложения users с авторизацией по JWT"""
+
+    def setUp(self):
+        self.user = User(email='test@mail.ru', first_name='danil', is_active=True)
+        self.user.set_password('qwerty')
+        self.user.save()
+        User.objects.create(email='alien@mail.ru', first_name='kirill')
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def test_users(self):
+        self.assertWithinQueryBudget(
+            self.client.get(reverse('users:users_list'))
+        )
+        self.assertWithinQueryBudget(
+            self.client.get(reverse('users:users_retrieve', args=[self.user.pk]))
+        )
+        self.assertWithinQueryBudget(
+            self.client.patch(reverse('users:users_update', args=[self.user.pk]), {'email': 'new@mail.ru'})
+        )
+        self.assertWithinQueryBudget(
+            self.client.post(reverse('users:reset_password'), {'email': 'new@mail.ru'})
+        )
+        self.assertWithinQueryBudget(
+            self.client.delete(reverse('users:users_delete', args=[self.user.pk]))
+        )
+
+    def test_auth(self):
+        self.client.credentials()
+
+        self.assertWithinQueryBudget(
+            self.client.post(reverse('users:users_register'), {'email': 'danil@yandex.ru', 'password': 'qwerty'})
+        )
+        self.assertWithinQueryBudget(
+            self.client.post(reverse('users:login'), {'email': 'test@mail.ru', 'password': 'qwerty'})
+        )
+        self.assertWithinQueryBudget(
+            self.client.post(reverse('users:token_refresh'), {'refresh': str(self.refresh)})
+        )
+
+    def test_reset_password_confirm(self):
+        User.objects.filter(pk=self.user.pk).update(token='token')
+
+        self.assertWithinQueryBudget(
+            self.client.post(reverse('users:reset_password_confirm'),
+                             {'uid': self.user.pk, 'token': 'token', 'new_password': 'qwerty1'}, format='json')
+        )
+
+
+class TokenClaimsTestCase(APITestCase):
+    """Класс для тестирования утверждения о группе администраторов в JWT"""
+
+    def setUp(self):
+        self.user = User(email='test@mail.ru', is_active=True)
+        self.user.set_password('qwerty')
+        self.user.save()
+        self.user.groups.add(Group.objects.create(name='Администраторы'))
+
+    def login(self):
+        return self.client.post(reverse('users:login'), {'email': 'test@mail.ru', 'password': 'qwerty'}).json()
+
+    def test_login_claims(self):
+        access = AccessToken(self.login()['access'])
+
+        self.assertTrue(
+            access['is_admin']
+        )
+
+    def test_refresh_recomputes_claims(self):
+        refresh = self.login()['refresh']
+        self.user.groups.clear()
+
+        response = self.client.post(reverse('users:token_refresh'), {'refresh': refresh})
+
+        self.assertFalse(
+            AccessToken(response.json()['access'])['is_admin']
+        )
+
+    def test_refresh_inactive_user(self):
+        refresh = self.login()['refresh']
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        response = self.client.post(reverse('users:token_refresh'), {'refresh': refresh})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_401_UNAUTHORIZED
+        )
+
+
+class UserAuthCacheTestCase(APITestCase):
+    """Класс для тестирования кэша пользователей при аутентификации по JWT"""
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User(email='test@mail.ru', is_active=True)
+        self.user.set_password('qwerty')
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = reverse('ads:ads_feed')
+
+    def test_cached_user(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_deactivation(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_password_change(self):
+        self.client.get(self.url)
+        self.user.set_password('qwerty1')
+        self.user.save()
+
+        self.assertIsNone(
+            user_cache.get(self.user.pk)
+        )
+
+    def test_reset_token_issued_by_other_process(self):
+        self.client.get(self.url)
+        # обновление без сигналов: так выглядит токен, выданный другим процессом, для кэша этого процесса
+        User.objects.filter(pk=self.user.pk).update(token='new-token')
+
+        response = self.client.post(reverse('users:reset_password_confirm'),
+                                    {'uid': self.user.pk, 'token': 'new-token', 'new_password': 'qwerty1'},
+                                    format='json')
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_deploy_check(self):
+        with override_settings(USERS_AUTH_CACHE_BACKEND=None):
+            warnings = check_user_cache_backend(None)
+        with override_settings(USERS_AUTH_CACHE_BACKEND='default'):
+            warnings += check_user_cache_backend(None)
+
+        self.assertEqual(
+            [warning.id for warning in warnings],
+            ['users.W001']
+        )
+
+    def test_delete(self):
+        self.client.get(self.url)
+        self.user.delete()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_cached_user_is_copy(self):
+        self.client.get(self.url)
+        user_cache.get(self.user.pk).first_name = 'changed'
+
+        self.assertEqual(
+            user_cache.get(self.user.pk).first_name,
+            ''
+        )
+
+    def test_shared_backend(self):
+        cache = UserCache(maxsize=10, ttl=60, backend='default')
+        cache.set(self.user.pk, self.user)
+        cached_email = cache.get(self.user.pk).email
+        cache.delete(self.user.pk)
+
+        self.assertEqual(
+            (cached_email, cache.get(self.user.pk)),
+            (self.user.email, None)
+        )
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', OUTBOX_MAX_ATTEMPTS=2)
+class OutboxTestCase(APITestCase):
+    """Класс для тестирования очереди писем и команды run_worker"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='test@mail.ru', is_active=True)
+        self.client.force_authenticate(user=self.user)
+
+    def run_worker(self, *args):
+        call_command('run_worker', '--once', *args, stdout=StringIO())
+
+    def test_reset_password_enqueues(self):
+        response = self.client.post(reverse('users:reset_password'), {'email': 'test@mail.ru'})
+        email = OutboxEmail.objects.get()
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            (len(mail.outbox), email.recipients, email.status),
+            (0, ['test@mail.ru'], OutboxEmail.PENDING)
+        )
+
+        self.run_worker()
+        email.refresh_from_db()
+
+        self.assertEqual(
+            (len(mail.outbox), email.status, email.attempts),
+            (1, OutboxEmail.SENT, 1)
+        )
+        self.assertIn(
+            f'uid:{self.user.pk}/token:{User.objects.get().token}',
+            mail.outbox[0].body
+        )
+
+    def test_batch_reuses_connection(self):
+        for number in range(5):
+            enqueue_email('subject', 'message', [f'user{number}@mail.ru'])
+
+        with mock.patch('users.outbox.get_connection', wraps=get_connection) as connections:
+            self.run_worker('--batch-size', '5')
+
+        self.assertEqual(
+            (len(mail.outbox), OutboxEmail.objects.filter(status=OutboxEmail.SENT).count()),
+            (5, 5)
+        )
+        self.assertEqual(
+            connections.call_count,
+            1
+        )
+
+    def test_retry_with_backoff(self):
+        email = enqueue_email('subject', 'message', ['test@mail.ru'])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=SMTPException),\
+                self.assertLogs('users.outbox', 'WARNING'):
+            self.run_worker()
+        email.refresh_from_db()
+
+        self.assertEqual(
+            (email.status, email.attempts),
+            (OutboxEmail.PENDING, 1)
+        )
+        self.assertGreater(
+            email.available_at,
+            timezone.now() + timedelta(seconds=20)
+        )
+
+        OutboxEmail.objects.filter(pk=email.pk).update(available_at=timezone.now())
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=SMTPException),\
+                self.assertLogs('users.outbox', 'WARNING'):
+            self.run_worker()
+        email.refresh_from_db()
+
+        self.assertEqual(
+            (email.status, email.attempts, len(mail.outbox)),
+            (OutboxEmail.FAILED, 2, 0)
+        )
+        self.assertIn(
+            'SMTPException',
+            email.last_error
+        )
+
+    def test_expired_lease(self):
+        email = enqueue_email('subject', 'message', ['test@mail.ru'])
+        OutboxEmail.objects.filter(pk=email.pk).update(status=OutboxEmail.SENDING,
+                                                       available_at=timezone.now() + timedelta(minutes=1))
+        self.run_worker()
+
+        self.assertEqual(
+            len(mail.outbox),
+            0
+        )
+
+        OutboxEmail.objects.filter(pk=email.pk).update(available_at=timezone.now())
+        self.run_worker()
+
+        self.assertEqual(
+            len(mail.outbox),
+            1
+        )
+
+
+class UserListTestCase(APITestCase):
+    """Класс для тестирования курсорной пагинации, поиска и раскрытия групп в списке пользователей"""
+
+    def setUp(self):
+        self.users = [User.objects.create(email=f'user{number}@mail.ru', first_name=f'user {number}')
+                      for number in range(5)]
+        self.users[0].groups.add(Group.objects.create(name='Администраторы'))
+        self.client.force_authenticate(user=self.users[0])
+        self.url = reverse('users:users_list')
+
+    def test_pages(self):
+        url, emails = f'{self.url}?page_size=2', []
+        while url:
+            data = self.client.get(url).json()
+            emails.extend(user['email'] for user in data['results'])
+            url = data['next']
+
+        self.assertEqual(
+            emails,
+            sorted(user.email for user in self.users)
+        )
+
+    def test_slim_fields(self):
+        with self.assertNumQueries(1):
+            data = self.client.get(self.url).json()
+
+        self.assertEqual(
+            set(data['results'][0]),
+            {'id', 'email', 'first_name', 'last_name', 'phone', 'image', 'role'}
+        )
+
+    def test_email_prefix(self):
+        User.objects.create(email='admin@mail.ru')
+
+        data = self.client.get(self.url, {'email': 'user3'}).json()
+
+        self.assertEqual(
+            [user['email'] for user in data['results']],
+            ['user3@mail.ru']
+        )
+
+    def test_expand_groups(self):
+        with self.assertNumQueries(2):
+            data = self.client.get(self.url, {'expand': 'groups'}).json()
+
+        self.assertEqual(
+            [user['groups'] for user in data['results']],
+            [['Администраторы'], [], [], [], []]
+        )
+
+    def test_expand_unknown(self):
+        response = self.client.get(self.url, {'expand': 'user_permissions'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class UserWriteTestCase(APITestCase):
+    """Класс для тестирования записи пользователя при регистрации и изменении профиля"""
+
+    def user_writes(self, method, url, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE'))]
+        return response, writes
+
+    def test_register_single_insert(self):
+        response, writes = self.user_writes('post', reverse('users:users_register'),
+                                            {'email': 'danil@yandex.ru', 'password': 'qwerty'})
+        user = User.objects.get()
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_201_CREATED
+        )
+        self.assertEqual(
+            len(writes),
+            1
+        )
+        self.assertTrue(
+            user.check_password('qwerty') and user.is_active
+        )
+        self.assertNotIn(
+            'password',
+            response.json()
+        )
+
+    def test_update_changed_columns(self):
+        user = User.objects.create(email='test@mail.ru', first_name='danil')
+        self.client.force_authenticate(user=user)
+        url = reverse('users:users_update', args=[user.pk])
+
+        response, writes = self.user_writes('patch', url, {'first_name': 'kirill', 'email': 'test@mail.ru'})
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            len(writes),
+            1
+        )
+        self.assertIn(
+            'SET "first_name"',
+            writes[0]
+        )
+        self.assertNotIn(
+            '"email"',
+            writes[0].split('WHERE')[0]
+        )
+
+        response, writes = self.user_writes('patch', url, {'first_name': 'kirill'})
+
+        self.assertEqual(
+            writes,
+            []
+        )
+
+    def test_update_image_with_same_name(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        user = User.objects.create(email='test@mail.ru')
+        self.client.force_authenticate(user=user)
+        url = reverse('users:users_update', args=[user.pk])
+
+        with override_settings(MEDIA_ROOT=directory.name):
+            for color in ('red', 'blue'):
+                content = BytesIO()
+                Image.new('RGB', (1, 1), color).save(content, 'PNG')
+                image = SimpleUploadedFile('avatar.png', content.getvalue(), content_type='image/png')
+                response = self.client.patch(url, {'image': image}, format='multipart')
+            user.refresh_from_db()
+            with Image.open(user.image.path) as stored:
+                pixel = stored.convert('RGB').getpixel((0, 0))
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            pixel,
+            (0, 0, 255)
+        )
+
+    def test_update_password_is_hashed(self):
+        user = User.objects.create(email='test@mail.ru', is_active=True)
+        self.client.force_authenticate(user=user)
+
+        self.client.patch(reverse('users:users_update', args=[user.pk]), {'password': 'qwerty1'})
+        user.refresh_from_db()
+
+        self.assertTrue(
+            user.check_password('qwerty1')
+        )
+
+    def test_hashing_pool_is_bounded(self):
+        pool = PasswordHasherPool(workers=1, queue_size=0)
+        pool.slots.acquire()
+
+        with self.assertRaises(PasswordHashingBusy):
+            pool.hash('qwerty')
+
+        pool.slots.release()
+        self.assertTrue(
+            pool.hash('qwerty').startswith('pbkdf2_sha256$')
+        )
+
+    def test_register_when_hashing_busy(self):
+        with mock.patch.object(password_hasher.slots, 'acquire', return_value=False):
+            response = self.client.post(reverse('users:users_register'),
+                                        {'email': 'danil@yandex.ru', 'password': 'qwerty'})
+
+        self.assertEqual(
+            (response.status_code, User.objects.count()),
+            (status.HTTP_503_SERVICE_UNAVAILABLE, 0)
+        )
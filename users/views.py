@@ -1,65 +1,94 @@
 import secrets
 
-from django.core.mail import send_mail
+from django.db import transaction
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveAPIView, UpdateAPIView, DestroyAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from ads.mixins import ExpandMixin
+from config.query_budget import QueryBudget
+from config.server_timing import PhaseTimingMixin
 from config.settings import EMAIL_HOST_USER
+from users.filters import UserFilter
 from users.models import User
+from users.outbox import enqueue_email
+from users.pagination import UsersCursorPagination
+from users.passwords import password_hasher
 from users.permissions import IsUserHimself
-from users.serializers import UserSerializer, UserCreateUpdateSerializer
+from users.serializers import (UserSerializer, UserCreateUpdateSerializer, UserListSerializer,
+                               UserTokenObtainPairSerializer, UserTokenRefreshSerializer)
 
 
-class UserCreateAPIView(CreateAPIView):
+class UserCreateAPIView(PhaseTimingMixin, CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserCreateUpdateSerializer
+    query_budget = QueryBudget(queries=2, milliseconds=50)
 
     def perform_create(self, serializer):
-        obj = serializer.save(is_active=True)
-        obj.set_password(self.request.data['password'])
-        obj.save()
+        serializer.save(is_active=True)
 
 
-class UserListAPIView(ListAPIView):
-    serializer_class = UserSerializer
-    queryset = User.objects.all()
+class UserListAPIView(PhaseTimingMixin, ExpandMixin, ListAPIView):
+    serializer_class = UserListSerializer
+    queryset = User.objects.only(*UserListSerializer.Meta.fields)
+    expandable_fields = ('groups',)
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = UserFilter
+    pagination_class = UsersCursorPagination
     permission_classes = (IsAuthenticated,)
+    query_budget = QueryBudget(queries=3, milliseconds=50)
 
 
-class UserRetrieveAPIView(RetrieveAPIView):
+class UserRetrieveAPIView(PhaseTimingMixin, RetrieveAPIView):
     serializer_class = UserSerializer
     queryset = User.objects.all()
     permission_classes = (IsUserHimself, IsAuthenticated)
+    query_budget = QueryBudget(queries=4, milliseconds=50)
 
 
-class UserUpdateAPIView(UpdateAPIView):
+class UserUpdateAPIView(PhaseTimingMixin, UpdateAPIView):
     serializer_class = UserCreateUpdateSerializer
     queryset = User.objects.all()
     permission_classes = (IsUserHimself, IsAuthenticated)
+    query_budget = QueryBudget(queries=3, milliseconds=50)
 
 
-class UserDestroyAPIView(DestroyAPIView):
+class UserDestroyAPIView(PhaseTimingMixin, DestroyAPIView):
     queryset = User.objects.all()
     permission_classes = (IsUserHimself, IsAuthenticated)
+    query_budget = QueryBudget(queries=10, milliseconds=100)
+
+
+class LoginAPIView(PhaseTimingMixin, TokenObtainPairView):
+    serializer_class = UserTokenObtainPairSerializer
+    query_budget = QueryBudget(queries=2, milliseconds=50)
+
+
+class TokenRefreshAPIView(PhaseTimingMixin, TokenRefreshView):
+    serializer_class = UserTokenRefreshSerializer
+    query_budget = QueryBudget(queries=1, milliseconds=50)
 
 
-class ResetPassword(APIView):
+class ResetPassword(PhaseTimingMixin, APIView):
     permission_classes = (IsAuthenticated,)
+    query_budget = QueryBudget(queries=5, milliseconds=50)
 
     @staticmethod
+    @transaction.atomic
     def post(request):
         email = request.data['email']
         token = secrets.token_hex(8)
         user = request.user
         user.token = token
-        user.save()
+        user.save(update_fields=['token'])
 
         uid = request.user.pk
         host = request.get_host()
         url = f"http://{host}/uid:{uid}/token:{token}/"
-        send_mail(
+        enqueue_email(
             subject='Восстановление пароля',
             message=f'Привет! Держите ссылку с данными для смены пароля: {url}',
             from_email=EMAIL_HOST_USER,
@@ -68,8 +97,9 @@ class ResetPassword(APIView):
         return Response({"message": "Письмо отправлено на почту"})
 
 
-class ResetPasswordConfirm(APIView):
+class ResetPasswordConfirm(PhaseTimingMixin, APIView):
     permission_classes = (IsAuthenticated,)
+    query_budget = QueryBudget(queries=3, milliseconds=50)
 
     @staticmethod
     def post(request):
@@ -77,9 +107,11 @@ class ResetPasswordConfirm(APIView):
         token = request.data['token']
         new_password = request.data['new_password']
 
-        if uid == request.user.pk and token == request.user.token:
+        # request.user может быть взят из кэша, а токен только что выдан другим процессом
+        current_token = User.objects.filter(pk=request.user.pk).values_list('token', flat=True).first()
+        if uid == request.user.pk and token == current_token:
             user = request.user
-            user.set_password(new_password)
-            user.save()
+            user.password = password_hasher.hash(new_password)
+            user.save(update_fields=['password'])
 
             return Response({"message": "Пароль успешно сменен"})